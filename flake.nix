@@ -18,8 +18,15 @@
       default = pkgs.mkShell {
         nativeBuildInputs = [
           (pkgs.python3.withPackages (p: [
+            p.fakeredis
+            p.h2
+            p.lupa
+            p.numpy
+            p.pytest
+            p.redis
             p.requests
             p.scrapy
+            p.scipy
             p.scrapy-splash
 
             (p.buildPythonPackage rec {
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+
+class ListingCheckpoint:
+    """Resumable cursor of a spider's in-browser listing loop.
+
+    The pages harvested so far, the last link seen and every link yielded
+    from them are rewritten to a JSON file after each listing page, so a
+    restarted crawl can carry on from there instead of paginating again from
+    the first page. JOBDIR doesn't help here, the position only exists in the
+    live Playwright page. A checkpoint older than ``max_age`` seconds is
+    discarded, as new articles will have pushed its page out of place.
+    """
+
+    def __init__(self, path, max_age=0):
+        self.path = Path(path)
+        self.page = 0
+        self.last_link = None
+        self.links = []
+        self.article_count = 0
+        self.complete = False
+        state = json.loads(self.path.read_text()) if self.path.exists() else None
+
+        if state is not None and max_age and time.time() - state.get("time", 0) > max_age:
+            logging.info(f"Discarding listing checkpoint {self.path} older than {max_age:.0f}s")
+            self.path.unlink(missing_ok=True)
+            state = None
+        self.resumed = state is not None
+
+        if self.resumed:
+            self.page = state["page"]
+            self.last_link = state["last_link"]
+            self.links = state["links"]
+            self.article_count = state["article_count"]
+            self.complete = state["complete"]
+        self._harvested = set(self.links)
+
+    @classmethod
+    def from_crawler(cls, crawler, spider):
+        # A job directory keeps the checkpoint next to the rest of the job state
+        directory = crawler.settings.get("JOBDIR") or crawler.settings.get("LISTING_CHECKPOINT_DIR")
+        if not directory:
+            return None
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        # A listing walked for another date window stops at other pages
+        name = spider.name
+        since, until = getattr(spider, "since", None), getattr(spider, "until", None)
+        if since or until:
+            name += f".{since or 'any'}_to_{until or 'any'}"
+        return cls(
+            Path(directory) / f"{name}.listing.json",
+            crawler.settings.getfloat("LISTING_CHECKPOINT_MAX_AGE"),
+        )
+
+    def __contains__(self, link):
+        return link in self._harvested
+
+    def add(self, link):
+        self.last_link = link
+        if link not in self._harvested:
+            self._harvested.add(link)
+            self.links.append(link)
+
+    def page_done(self, article_count):
+        self.page += 1
+        self.article_count = article_count
+        self.save()
+
+    def finish(self, article_count):
+        self.article_count = article_count
+        self.complete = True
+        self.save()
+
+    def save(self):
+        state = {
+            "page": self.page,
+            "last_link": self.last_link,
+            "links": self.links,
+            "article_count": self.article_count,
+            "complete": self.complete,
+            "time": time.time(),
+        }
+        # Written aside and renamed so a crash never leaves a partial file
+        temporary = self.path.with_suffix(".json.tmp")
+        temporary.write_text(json.dumps(state))
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        logging.info(f"Listing finished, removing checkpoint {self.path}")
+        self.path.unlink(missing_ok=True)
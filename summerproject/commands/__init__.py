@@ -0,0 +1,33 @@
+# Project specific scrapy commands, mostly benchmarks
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/commands.html#custom-project-commands
+
+from http.server import ThreadingHTTPServer
+from threading import Thread
+
+from scrapy.crawler import Crawler
+from scrapy.utils.reactor import install_reactor
+
+
+def prepare_reactor(settings):
+    # Install the configured reactor up front so several crawlers can be
+    # created with their own settings inside one process
+    install_reactor(settings["TWISTED_REACTOR"], settings["ASYNCIO_EVENT_LOOP"])
+
+
+def make_crawler(crawler_process, spider, overrides):
+    # spider is either a registered spider name or a spider class
+    settings = crawler_process.settings.copy()
+    settings.setdict(overrides, priority="cmdline")
+    if isinstance(spider, str):
+        spider = crawler_process.spider_loader.load(spider)
+    return Crawler(spider, settings)
+
+
+def serve_in_thread(handler_class):
+    """Start a local HTTP server for benchmarks, returning it once listening."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
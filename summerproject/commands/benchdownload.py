@@ -0,0 +1,112 @@
+from http.server import BaseHTTPRequestHandler
+
+import scrapy
+from scrapy.commands import ScrapyCommand
+from twisted.internet import defer
+
+from summerproject.commands import make_crawler, prepare_reactor, serve_in_thread
+
+HANDLERS = {
+    "playwright": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
+    "fastpath": "summerproject.handlers.FastPathDownloadHandler",
+}
+
+# Roughly the size of a real article page
+ARTICLE_BODY = (
+    b"<html><head><title>Article</title></head><body><main><h1>Article</h1>"
+    + b"<p>" + b"Lorem ipsum dolor sit amet. " * 40 + b"</p>" * 50
+    + b"</main></body></html>"
+)
+
+
+class ArticleHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(ARTICLE_BODY)))
+        self.end_headers()
+        self.wfile.write(ARTICLE_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ArticleSpider(scrapy.Spider):
+    name = "benchdownload"
+
+    def __init__(self, base_url, articles, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+        self.articles = articles
+
+    def start_requests(self):
+        for i in range(self.articles):
+            yield scrapy.Request(f"{self.base_url}/article/{i}")
+
+    def parse(self, response):
+        pass
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_LEVEL": "WARNING"}
+
+    def short_desc(self):
+        return "Compare plain article download throughput between download handlers"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--articles",
+            type=int,
+            default=2000,
+            help="articles to download per handler (default: 2000)",
+        )
+        parser.add_argument(
+            "--handlers",
+            default=",".join(HANDLERS),
+            help=f"comma separated handlers to compare, from: {', '.join(HANDLERS)}",
+        )
+
+    def run(self, args, opts):
+        prepare_reactor(self.settings)
+        from twisted.internet import reactor
+
+        server = serve_in_thread(ArticleHandler)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        results = {}
+        d = self._run_handlers(base_url, opts, results)
+        d.addErrback(lambda failure: failure.printTraceback())
+        d.addBoth(lambda _: reactor.stop())
+        self.crawler_process.start(stop_after_crawl=False)
+        server.shutdown()
+
+        for handler, (count, elapsed) in results.items():
+            rate = count / elapsed if elapsed else 0.0
+            print(f"{handler:>10}: {count} articles in {elapsed:.2f}s ({rate:.1f} articles/s)")
+
+    @defer.inlineCallbacks
+    def _run_handlers(self, base_url, opts, results):
+        for handler in opts.handlers.split(","):
+            crawler = make_crawler(
+                self.crawler_process,
+                ArticleSpider,
+                {
+                    "DOWNLOAD_HANDLERS": {"http": HANDLERS[handler], "https": HANDLERS[handler]},
+                    "ITEM_PIPELINES": {},
+                    "SEEN_INDEX_PATH": None,
+                    # Every handler must fetch the same URLs from the server
+                    "HTTPCACHE_ENABLED": False,
+                },
+            )
+            yield self.crawler_process.crawl(
+                crawler, base_url=base_url, articles=opts.articles
+            )
+
+            stats = crawler.stats
+            elapsed = (stats.get_value("finish_time") - stats.get_value("start_time")).total_seconds()
+            results[handler] = (stats.get_value("response_received_count", 0), elapsed)
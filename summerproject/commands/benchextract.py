@@ -0,0 +1,66 @@
+import time
+import tracemalloc
+from pathlib import Path
+
+from scrapy.commands import ScrapyCommand
+
+from summerproject import extractors
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self):
+        return "[options] [site ...]"
+
+    def short_desc(self):
+        return "Benchmark article extractors against the saved HTML corpus"
+
+    def long_desc(self):
+        return (
+            "Run each site's extractor over the HTML fixtures in "
+            "BENCH_CORPUS_DIR/<site>/ and report documents per second, plus the "
+            "peak memory Python allocates per document, measured by tracemalloc."
+        )
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=200,
+            help="passes over each site's corpus (default: 200)",
+        )
+
+    def run(self, args, opts):
+        corpus = Path(self.settings.get("BENCH_CORPUS_DIR"))
+        sites = args or sorted(p.name for p in corpus.iterdir() if p.is_dir())
+
+        for site in sites:
+            extractor = getattr(extractors, f"extract_{site}")
+            documents = [
+                (f"https://example.com/{path.name}", path.read_bytes())
+                for path in sorted((corpus / site).glob("*.html"))
+            ]
+
+            start = time.perf_counter()
+            for _ in range(opts.iterations):
+                for url, body in documents:
+                    extractor(url, body, "utf-8")
+            elapsed = time.perf_counter() - start
+            count = opts.iterations * len(documents)
+
+            # Measured separately so tracing doesn't skew the timings
+            peaks = []
+            tracemalloc.start()
+            for url, body in documents:
+                tracemalloc.reset_peak()
+                extractor(url, body, "utf-8")
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+            print(
+                f"{site:>10}: {count / elapsed:8.1f} docs/s,"
+                f" peak {sum(peaks) / len(peaks) / 1024:7.1f} KiB/doc allocated"
+            )
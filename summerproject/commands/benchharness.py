@@ -0,0 +1,196 @@
+import os
+import tempfile
+import time
+
+from scrapy.commands import ScrapyCommand
+from scrapy.utils.conf import arglist_to_dict
+from twisted.internet import defer, task
+
+from summerproject.commands import make_crawler, prepare_reactor, serve_in_thread
+from summerproject.harness import CLONES, clone_handler
+from summerproject.memory import browser_rss, cpu_seconds, descendants
+
+
+class ResourceSampler:
+    """Track the browsers' RSS and the CPU time of this process and its
+    children, which are the Playwright driver and the browsers it started."""
+
+    def __init__(self):
+        self.peak_rss = 0
+        self.rss_samples = []
+        self.start_cpu = cpu_seconds(os.getpid())
+        self.crawler_cpu = 0.0
+        # Browser processes come and go, so keep the last reading of each
+        self.child_cpu = {}
+
+    def sample(self):
+        rss = browser_rss()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+            self.rss_samples.append(rss)
+        self.crawler_cpu = cpu_seconds(os.getpid()) - self.start_cpu
+        for pid in descendants(os.getpid()):
+            self.child_cpu[pid] = max(self.child_cpu.get(pid, 0.0), cpu_seconds(pid))
+
+    @property
+    def browser_cpu(self):
+        return sum(self.child_cpu.values())
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_LEVEL": "WARNING"}
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Benchmark whole crawls against generated local clones of the news sites"
+
+    def long_desc(self):
+        return (
+            "Serve a generated clone of each site (abc, cnn, aljazeera by default) "
+            "with the real sites' DOM, crawl it with the spider of the same name, "
+            "and report articles per minute, download and render latency "
+            "percentiles, peak browser memory and CPU time. Pass -a shards=N to "
+            "walk the listing over plain HTTP instead of clicking through it."
+        )
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "-a",
+            dest="spargs",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="set spider argument (may be repeated)",
+        )
+        parser.add_argument(
+            "--listing-pages",
+            type=int,
+            default=20,
+            help="listing pages per site (default: 20)",
+        )
+        parser.add_argument(
+            "--articles",
+            type=int,
+            default=400,
+            help="articles per site (default: 400)",
+        )
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=50,
+            help="mean server latency in milliseconds (default: 50)",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="share of article requests answered with 503 (default: 0)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="seed for the generated sites, latencies and errors (default: 0)",
+        )
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        opts.spargs = arglist_to_dict(opts.spargs)
+
+    def run(self, args, opts):
+        prepare_reactor(self.settings)
+        from twisted.internet import reactor
+
+        results = {}
+        d = self._run_sites(args or list(CLONES), opts, results)
+        d.addErrback(lambda failure: failure.printTraceback())
+        d.addBoth(lambda _: reactor.stop())
+        self.crawler_process.start(stop_after_crawl=False)
+
+        print(
+            f"{opts.listing_pages} listing pages, {opts.articles} articles,"
+            f" {opts.latency_ms:.0f}ms latency, {opts.error_rate:.0%} errors"
+        )
+        for site, result in results.items():
+            print(f"{site}:")
+            for line in result:
+                print(f"  {line}")
+
+    @defer.inlineCallbacks
+    def _run_sites(self, sites, opts, results):
+        for site in sites:
+            clone = CLONES[site](opts.listing_pages, opts.articles, opts.seed)
+            server = serve_in_thread(
+                clone_handler(clone, opts.latency_ms / 1000, opts.error_rate, opts.seed)
+            )
+            try:
+                results[site] = yield self._crawl(site, server, opts)
+            finally:
+                server.shutdown()
+
+    @defer.inlineCallbacks
+    def _crawl(self, site, server, opts):
+        with tempfile.TemporaryDirectory() as directory:
+            crawler = make_crawler(
+                self.crawler_process,
+                site,
+                {
+                    # Every run starts from an empty store and the first page
+                    "SEEN_INDEX_PATH": None,
+                    "STORAGE_PATH": os.path.join(directory, "articles.sqlite3"),
+                    "NEAR_DUPLICATE_INDEX_PATH": os.path.join(directory, "seen.sqlite3"),
+                    "ENRICHMENT_DIR": os.path.join(directory, "features"),
+                    "HTTPCACHE_ENABLED": False,
+                    "LISTING_CHECKPOINT_DIR": "",
+                    "METRICS_DIR": "",
+                    # Stop on the last page rather than waiting for a Next that never comes
+                    "LISTING_MAX_PAGES": opts.listing_pages,
+                },
+            )
+            sampler = ResourceSampler()
+            sampling = task.LoopingCall(sampler.sample)
+            sampling.start(1.0)
+            started = time.perf_counter()
+            try:
+                yield self.crawler_process.crawl(
+                    crawler,
+                    base_url=f"http://127.0.0.1:{server.server_port}",
+                    max_articles=opts.articles,
+                    **opts.spargs,
+                )
+            finally:
+                sampling.stop()
+            elapsed = time.perf_counter() - started
+            sampler.sample()
+
+        stats = crawler.stats
+        articles = stats.get_value("item_scraped_count", 0)
+        lines = [
+            f"{articles} articles in {elapsed:.1f}s ({articles / elapsed * 60:.0f} articles/min),"
+            f" {stats.get_value('listing/pages', 0)} listing pages,"
+            f" {stats.get_value('downloader/response_status_count/503', 0)} 503s retried"
+        ]
+        for stage in ("download", "render"):
+            metrics = getattr(crawler, "metrics", None)
+            histogram = metrics and metrics.histograms.get((stage, site, "127.0.0.1"))
+            if histogram is not None:
+                lines.append(
+                    f"{stage} latency: p50 {histogram.quantile(0.5)}ms,"
+                    f" p90 {histogram.quantile(0.9)}ms, p99 {histogram.quantile(0.99)}ms"
+                    f" (upper bucket bounds, {histogram.count} requests)"
+                )
+        if sampler.rss_samples:
+            mean = sum(sampler.rss_samples) / len(sampler.rss_samples)
+            lines.append(
+                f"browser RSS: peak {sampler.peak_rss / 1024**2:.0f}MB,"
+                f" mean {mean / 1024**2:.0f}MB"
+            )
+        lines.append(
+            f"CPU: crawler {sampler.crawler_cpu:.1f}s ({sampler.crawler_cpu / elapsed:.0%}),"
+            f" child processes {sampler.browser_cpu:.1f}s ({sampler.browser_cpu / elapsed:.0%})"
+        )
+        return lines
@@ -0,0 +1,98 @@
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from scrapy.commands import ScrapyCommand
+
+from summerproject.extractors import ABC_DATA_IDENTIFIER, ABC_STORY_PATHS
+from summerproject.partialjson import extract_paths
+
+_decoder = json.JSONDecoder()
+
+
+def full_decode(text, start):
+    story = _decoder.raw_decode(text, start)[0]["page"]["content"]["story"]["story"]
+    return story["publishedDate"], story["authorsStr"], story["wordCount"]
+
+
+def partial_decode(text, start):
+    return extract_paths(text, ABC_STORY_PATHS, start)
+
+
+def expected(blob, start):
+    """The ABC_STORY_PATHS values of a blob, from a full decode."""
+    state = _decoder.raw_decode(blob, start)[0]
+    values = {}
+    for path in ABC_STORY_PATHS:
+        value = state
+        for key in path.split("."):
+            value = value[key]
+        values[path] = value
+    return values
+
+
+def padded_blob(script, size):
+    # Grow the page state with unrelated page furniture until it reaches size.
+    # It goes ahead of the story so the partial scan has to step over it, and
+    # related stories in it use the same keys as the story.
+    state = _decoder.raw_decode(script, script.index(ABC_DATA_IDENTIFIER) + len(ABC_DATA_IDENTIFIER))[0]
+    filler = {"id": 0, "type": "module", "body": "x" * 200, "tags": list(range(20))}
+    related = {
+        "type": "related",
+        "story": {"story": {"publishedDate": "WRONG", "authorsStr": "WRONG", "wordCount": -1}},
+    }
+    modules = []
+    state["page"] = {"meta": {"content": {"modules": modules}}, **state["page"]}
+    state["page"]["content"] = {"modules": modules, **state["page"]["content"]}
+    while len(json.dumps(state)) < size:
+        modules.extend([dict(filler)] * 50 + [related])
+    return f"{ABC_DATA_IDENTIFIER}{json.dumps(state)};window.__other__={{}};"
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def short_desc(self):
+        return "Compare full and partial decoding of ABC page-state blobs"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--sizes",
+            default="100,300,600",
+            help="comma separated blob sizes in KB (default: 100,300,600)",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=50,
+            help="decodes per blob and method (default: 50)",
+        )
+
+    def run(self, args, opts):
+        corpus = Path(self.settings.get("BENCH_CORPUS_DIR")) / "abc"
+        html = next(iter(sorted(corpus.glob("*.html")))).read_text()
+        script = html[html.index(ABC_DATA_IDENTIFIER):html.index("</script>", html.index(ABC_DATA_IDENTIFIER))]
+
+        for size in opts.sizes.split(","):
+            blob = padded_blob(script, int(size) * 1024)
+            start = len(ABC_DATA_IDENTIFIER)
+            assert partial_decode(blob, start) == expected(blob, start)
+
+            for name, decode in (("full", full_decode), ("partial", partial_decode)):
+                began = time.perf_counter()
+                for _ in range(opts.iterations):
+                    decode(blob, start)
+                latency = (time.perf_counter() - began) / opts.iterations
+
+                tracemalloc.start()
+                decode(blob, start)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                print(
+                    f"{len(blob) // 1024:>5} KB {name:>8}: {latency * 1000:7.2f} ms/article,"
+                    f" peak {peak / 1024:8.1f} KiB"
+                )
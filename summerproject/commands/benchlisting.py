@@ -0,0 +1,94 @@
+import os
+import tempfile
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from scrapy.utils.conf import arglist_to_dict
+from twisted.internet import defer
+
+from summerproject.commands import make_crawler, prepare_reactor
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_LEVEL": "INFO"}
+
+    def syntax(self):
+        return "[options] <spider>"
+
+    def short_desc(self):
+        return "Compare listing pages per minute with fixed sleeps and readiness waits"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "-a",
+            dest="spargs",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="set spider argument (may be repeated)",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=10,
+            help="listing pages to walk in each mode (default: 10)",
+        )
+        parser.add_argument(
+            "--modes",
+            default="sleep,event",
+            help="comma separated LISTING_READINESS modes to compare",
+        )
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        opts.spargs = arglist_to_dict(opts.spargs)
+
+    def run(self, args, opts):
+        if len(args) != 1:
+            raise UsageError()
+
+        prepare_reactor(self.settings)
+        from twisted.internet import reactor
+
+        results = {}
+        d = self._run_modes(args[0], opts, results)
+        d.addErrback(lambda failure: failure.printTraceback())
+        d.addBoth(lambda _: reactor.stop())
+        self.crawler_process.start(stop_after_crawl=False)
+
+        for mode, (pages, elapsed) in results.items():
+            rate = pages / elapsed * 60 if elapsed else 0.0
+            print(f"{mode:>8}: {pages} listing pages in {elapsed:.1f}s ({rate:.1f} pages/min)")
+
+    @defer.inlineCallbacks
+    def _run_modes(self, spider_name, opts, results):
+        for mode in opts.modes.split(","):
+            with tempfile.TemporaryDirectory() as directory:
+                crawler = make_crawler(
+                    self.crawler_process,
+                    spider_name,
+                    {
+                        "LISTING_READINESS": mode,
+                        "LISTING_MAX_PAGES": opts.pages,
+                        # Only listing throughput is measured, so every mode
+                        # starts from empty state and leaves none behind
+                        "SEEN_INDEX_PATH": None,
+                        "STORAGE_PATH": os.path.join(directory, "articles.sqlite3"),
+                        "NEAR_DUPLICATE_INDEX_PATH": os.path.join(directory, "seen.sqlite3"),
+                        "ENRICHMENT_DIR": os.path.join(directory, "features"),
+                        "HTTPCACHE_ENABLED": False,
+                        "LISTING_CHECKPOINT_DIR": "",
+                        "METRICS_DIR": "",
+                    },
+                )
+                yield self.crawler_process.crawl(crawler, **opts.spargs)
+
+            stats = crawler.stats
+            pages = stats.get_value("listing/pages", 0)
+            first = stats.get_value("listing/first_page_time")
+            last = stats.get_value("listing/last_page_time")
+            # Rates are measured between the first and last harvested page
+            elapsed = last - first if first and last else 0.0
+            results[mode] = (max(pages - 1, 0), elapsed)
@@ -0,0 +1,130 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from scrapy import signals
+from scrapy.commands import ScrapyCommand
+from scrapy.utils.conf import closest_scrapy_cfg
+
+from summerproject.memory import descendants, rss
+
+MARKER = "startup-probe "
+
+# Imports that only some crawls need, reported when a run pulled them in
+BACKENDS = ["playwright.async_api", "scrapy_playwright.handler", "scrapy_splash", "numpy", "scipy"]
+
+
+class StartupProbe:
+    """Report what a crawl has loaded once its engine is running, then end the
+    process; the benchmark is after startup, not the crawl."""
+
+    def __init__(self, crawler):
+        crawler.signals.connect(self.engine_started, signals.engine_started)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def engine_started(self):
+        report = {
+            "modules": len(sys.modules),
+            "backends": [name for name in BACKENDS if name in sys.modules],
+            # Browser drivers started along the way aren't in our own peak
+            "children_rss": sum(rss(pid) for pid in descendants(os.getpid())),
+        }
+        print(f"{MARKER}{json.dumps(report)}", flush=True)
+        os._exit(0)
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Benchmark cold start time and memory of the project's commands and spiders"
+
+    def long_desc(self):
+        return (
+            "Start `scrapy list` and `scrapy crawl <spider>` for each spider (all "
+            "by default) in fresh processes, with the project settings, and "
+            "report the time until the command finished or the crawl's engine "
+            "started, the peak RSS by then, the modules imported and which "
+            "optional backends (Playwright, Splash, numpy) were among them. "
+            "Crawls are stopped as soon as they are running and run in a "
+            "temporary directory, so they don't touch the network or local state."
+        )
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=5,
+            help="processes started per command (default: 5)",
+        )
+
+    def run(self, args, opts):
+        spiders = args or sorted(self.crawler_process.spider_loader.list())
+        commands = [("list", ["list"])]
+        commands += [
+            (f"crawl {name}", ["crawl", name, "-s", f"EXTENSIONS={json.dumps(PROBE)}"])
+            for name in spiders
+        ]
+
+        env = dict(os.environ)
+        project = os.path.dirname(closest_scrapy_cfg())
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [project, env.get("PYTHONPATH")]))
+
+        print(f"{'command':<20} {'median':>8} {'min':>8} {'peak RSS':>9} {'modules':>8}  backends")
+        with tempfile.TemporaryDirectory() as directory:
+            for label, argv in commands:
+                runs = [
+                    self._start(argv, directory, env) for _ in range(opts.runs)
+                ]
+                times = [elapsed for elapsed, _, _ in runs]
+                peak = max(peak for _, peak, _ in runs)
+                report = runs[-1][2]
+                backends = ", ".join(report.get("backends", [])) or "-"
+                print(
+                    f"{label:<20} {statistics.median(times) * 1000:>6.0f}ms"
+                    f" {min(times) * 1000:>6.0f}ms {peak / 1024**2:>7.0f}MB"
+                    f" {report.get('modules', '?'):>8}  {backends}"
+                )
+
+    def _start(self, argv, directory, env):
+        """Run ``scrapy <argv>`` in a new process and return its wall time, peak
+        RSS (its own plus any children alive at the probe) and probe report."""
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "scrapy", *argv],
+            cwd=directory,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        report = {}
+        for line in process.stdout:
+            if line.startswith(MARKER):
+                report = json.loads(line[len(MARKER) :])
+                break
+        elapsed = time.perf_counter() - started
+
+        process.stdout.close()
+        # wait4 rather than wait, for the child's own peak RSS
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode and not report:
+            print(f"scrapy {' '.join(argv)} exited with {process.returncode}", file=sys.stderr)
+        peak = usage.ru_maxrss * 1024 + report.get("children_rss", 0)
+        return elapsed, peak, report
+
+
+PROBE = {f"{StartupProbe.__module__}.{StartupProbe.__name__}": 0}
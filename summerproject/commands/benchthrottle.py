@@ -0,0 +1,174 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import scrapy
+from scrapy.commands import ScrapyCommand
+from twisted.internet import defer, task
+
+from summerproject.commands import make_crawler, prepare_reactor, serve_in_thread
+
+BODY = b"<html><body><p>" + b"Lorem ipsum dolor sit amet. " * 200 + b"</p></body></html>"
+
+
+def simulated_site(capacity, latency, reject_at):
+    """Handler for a site that serves ``capacity`` requests at a time in
+    ``latency`` seconds and slows down proportionally past that, like a
+    saturated backend, answering 429 beyond ``reject_at`` in flight."""
+    lock = threading.Lock()
+    in_flight = [0]
+
+    class SimulatedSiteHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            with lock:
+                in_flight[0] += 1
+                load = in_flight[0]
+            try:
+                if load > reject_at:
+                    self.send_response(429)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                time.sleep(latency * max(1.0, load / capacity))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(BODY)))
+                self.end_headers()
+                self.wfile.write(BODY)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        def log_message(self, format, *args):
+            pass
+
+    return SimulatedSiteHandler
+
+
+class ThrottleSpider(scrapy.Spider):
+    name = "benchthrottle"
+
+    def __init__(self, base_url, articles, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+        self.articles = articles
+
+    def start_requests(self):
+        for i in range(self.articles):
+            yield scrapy.Request(f"{self.base_url}/article/{i}")
+
+    def parse(self, response):
+        pass
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_LEVEL": "WARNING"}
+
+    def short_desc(self):
+        return "Show adaptive concurrency converging against a simulated slow site"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--articles",
+            type=int,
+            default=3000,
+            help="articles to download (default: 3000)",
+        )
+        parser.add_argument(
+            "--capacity",
+            type=int,
+            default=8,
+            help="requests the site serves in parallel before slowing down (default: 8)",
+        )
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=50,
+            help="site latency below capacity in milliseconds (default: 50)",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="seconds between concurrency adjustments (default: 1.0)",
+        )
+
+    def run(self, args, opts):
+        prepare_reactor(self.settings)
+        from twisted.internet import reactor
+
+        handler = simulated_site(opts.capacity, opts.latency_ms / 1000, opts.capacity * 4)
+        server = serve_in_thread(handler)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        samples = []
+        d = self._crawl(base_url, opts, samples)
+        d.addErrback(lambda failure: failure.printTraceback())
+        d.addBoth(lambda _: reactor.stop())
+        self.crawler_process.start(stop_after_crawl=False)
+        server.shutdown()
+
+        print(f"site capacity {opts.capacity}, latency {opts.latency_ms:.0f}ms")
+        print("    time  concurrency  responses/s  429s")
+        for elapsed, concurrency, rate, rejected in samples:
+            print(f"{elapsed:7.1f}s  {concurrency:11d}  {rate:11.1f}  {rejected:4d}")
+
+        tail = [concurrency for _, concurrency, _, _ in samples[len(samples) // 2 :]]
+        if tail:
+            print(
+                f"second half: concurrency {min(tail)}-{max(tail)}"
+                f" (mean {sum(tail) / len(tail):.1f})"
+            )
+
+    @defer.inlineCallbacks
+    def _crawl(self, base_url, opts, samples):
+        crawler = make_crawler(
+            self.crawler_process,
+            ThrottleSpider,
+            {
+                "ITEM_PIPELINES": {},
+                "SEEN_INDEX_PATH": None,
+                "HTTPCACHE_ENABLED": False,
+                "METRICS_DIR": "",
+                "CONCURRENT_REQUESTS": 256,
+                "ADAPTIVE_CONCURRENCY_INTERVAL": opts.interval,
+                "ADAPTIVE_CONCURRENCY_LIMITS": {"plain": [1, 64], "browser": [1, 8]},
+            },
+        )
+        started = time.perf_counter()
+        last = {"responses": 0, "429": 0, "time": started}
+
+        def sample():
+            if crawler.engine is None:
+                return
+            slot = crawler.engine.downloader.slots.get("127.0.0.1#plain")
+            if slot is None:
+                return
+            now = time.perf_counter()
+            stats = crawler.stats
+            responses = stats.get_value("downloader/response_count", 0)
+            rejected = stats.get_value("downloader/response_status_count/429", 0)
+            samples.append(
+                (
+                    now - started,
+                    slot.concurrency,
+                    (responses - last["responses"]) / (now - last["time"]),
+                    rejected - last["429"],
+                )
+            )
+            last.update(responses=responses, time=now)
+            last["429"] = rejected
+
+        sampler = task.LoopingCall(sample)
+        sampler.start(opts.interval, now=False)
+        try:
+            yield self.crawler_process.crawl(
+                crawler, base_url=base_url, articles=opts.articles
+            )
+        finally:
+            sampler.stop()
@@ -0,0 +1,93 @@
+import logging
+
+from scrapy.commands import ScrapyCommand
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import defer
+
+from summerproject.commands import make_crawler, prepare_reactor
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Run several spiders in one process sharing a single browser"
+
+    def long_desc(self):
+        return (
+            "Run the given spiders (default: all of them) in one process. One "
+            "Chromium is launched up front and every crawler connects to it over "
+            "CDP, each limited to an equal share of the browser's pages."
+        )
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--max-pages",
+            type=int,
+            default=12,
+            help="open pages shared between all sites (default: 12)",
+        )
+        parser.add_argument(
+            "--contexts-per-site",
+            type=int,
+            default=2,
+            help="browser contexts each site may hold (default: 2)",
+        )
+        parser.add_argument(
+            "--cdp-port",
+            type=int,
+            default=9222,
+            help="remote debugging port for the shared browser (default: 9222)",
+        )
+
+    def run(self, args, opts):
+        spider_names = args or self.crawler_process.spider_loader.list()
+
+        prepare_reactor(self.settings)
+        from twisted.internet import reactor
+
+        d = deferred_from_coro(self._launch_browser(opts.cdp_port))
+        d.addCallback(lambda _: self._crawl_all(spider_names, opts))
+        d.addErrback(lambda failure: failure.printTraceback())
+        d.addBoth(lambda _: deferred_from_coro(self._close_browser()))
+        d.addBoth(lambda _: reactor.stop())
+        self.crawler_process.start(stop_after_crawl=False)
+
+    async def _launch_browser(self, port):
+        from playwright.async_api import async_playwright
+
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(
+            headless=True,
+            args=[f"--remote-debugging-port={port}"],
+        )
+        logging.info(f"Shared browser listening on port {port}")
+
+    async def _close_browser(self):
+        await self.browser.close()
+        await self.playwright.stop()
+
+    def _crawl_all(self, spider_names, opts):
+        # Every site gets the same slice of the page pool so a slow site
+        # can't starve the others of browser pages
+        site_pages = max(1, opts.max_pages // len(spider_names))
+        contexts = max(1, min(opts.contexts_per_site, site_pages))
+
+        crawls = []
+        for name in spider_names:
+            crawler = make_crawler(
+                self.crawler_process,
+                name,
+                {
+                    "PLAYWRIGHT_CDP_URL": f"http://127.0.0.1:{opts.cdp_port}",
+                    "PLAYWRIGHT_LAUNCH_OPTIONS": {},
+                    "PLAYWRIGHT_MAX_CONTEXTS": contexts,
+                    "PLAYWRIGHT_MAX_PAGES_PER_CONTEXT": max(1, site_pages // contexts),
+                },
+            )
+            crawls.append(self.crawler_process.crawl(crawler))
+        return defer.DeferredList(crawls)
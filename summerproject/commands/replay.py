@@ -0,0 +1,31 @@
+from scrapy.commands.crawl import Command as CrawlCommand
+
+# Serve every request from the HTTP cache and let already stored articles
+# through again, so a fixed extractor can be re-run over a previous crawl
+REPLAY_SETTINGS = {
+    "HTTPCACHE_ENABLED": True,
+    "HTTPCACHE_OFFLINE": True,
+    "HTTPCACHE_IGNORE_MISSING": True,
+    "SEEN_INDEX_PATH": "",
+    "NEAR_DUPLICATE_INDEX_PATH": "",
+    "LISTING_CHECKPOINT_DIR": "",
+}
+
+
+class Command(CrawlCommand):
+    def short_desc(self):
+        return "Re-run a spider from the HTTP cache without touching the network"
+
+    def long_desc(self):
+        return (
+            "Run a spider with every response served from the HTTP cache. "
+            "Requests that were never cached are dropped. Listings are walked "
+            "by page number, since there is no browser page to click through, "
+            "so only the listing pages of a sharded crawl (-a shards=N) are in "
+            "the cache; spiders without numbered listing pages, like "
+            "aljazeera, can't be replayed."
+        )
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        self.settings.setdict(REPLAY_SETTINGS, priority="cmdline")
@@ -0,0 +1,62 @@
+"""Publication dates as the news sites print them."""
+
+import re
+from datetime import date, datetime, timedelta
+
+# Date formats of listing cards and article metadata, besides ISO dates
+DATE_FORMATS = ["%d %b %Y", "%b %d, %Y", "%B %d, %Y", "%a %b %d, %Y"]
+URL_DATE = re.compile(r"/(\d{4})/(\d{1,2})/(\d{1,2})/")
+# The newest cards say "3 hours ago" or "a day ago"
+RELATIVE_DATE = re.compile(
+    r"(\d+|an?|one)\s+(second|minute|min|hour|hr|day|week)s?\s+ago", re.IGNORECASE
+)
+UNIT_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "min": 60,
+    "hour": 3600,
+    "hr": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+}
+
+
+def parse_date(text, now=None):
+    """Date of a listing card or article as the sites print it, or None.
+
+    Relative dates count back from ``now``, the current local time by default.
+    """
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            pass
+    match = RELATIVE_DATE.fullmatch(text)
+    if match:
+        count, unit = match.groups()
+        count = int(count) if count.isdigit() else 1
+        now = now or datetime.now()
+        return (now - timedelta(seconds=count * UNIT_SECONDS[unit.lower()])).date()
+    if text.lower() == "yesterday":
+        return (now or datetime.now()).date() - timedelta(days=1)
+    return None
+
+
+def card_date(link, text):
+    # Article URLs on some sites are dated, e.g. /2024/09/30/
+    published = parse_date(text)
+    if published is None and link:
+        match = URL_DATE.search(link)
+        if match:
+            try:
+                published = date(*map(int, match.groups()))
+            except ValueError:
+                pass
+    return published
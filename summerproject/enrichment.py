@@ -0,0 +1,191 @@
+"""Hashed term frequency features of article content, computed in batches.
+
+Each batch of articles becomes one directory of plain .npy arrays, a CSR
+matrix of term counts (``data``, ``indices``, ``indptr``) with one row per
+article and per-article ``tokens``, ``characters``, ``terms`` and
+``language`` statistics, plus ``meta.json`` with the article URLs. Analysis
+jobs can memory-map them with load_batch instead of tokenizing the stored
+JSON again.
+
+Words are hashed into a fixed number of columns, so batches from different
+crawls share one feature space without a vocabulary.
+"""
+
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+TOKEN = re.compile(r"\w+")
+
+# The most frequent function words of each language, enough to tell apart
+# article languages, not to classify short snippets
+STOPWORDS = {
+    "en": ["the", "and", "of", "to", "in", "is", "that", "for", "was", "on", "with", "said"],
+    "fr": ["le", "les", "des", "et", "est", "une", "du", "dans", "pour", "qui", "au", "sur"],
+    "es": ["el", "los", "las", "del", "y", "en", "por", "para", "una", "con", "se", "fue"],
+    "de": ["der", "die", "das", "und", "ist", "nicht", "mit", "von", "den", "ein", "sich", "auf"],
+    "ar": ["في", "من", "على", "أن", "إلى", "التي", "الذي", "عن", "مع", "هذا", "كان", "قد"],
+    "he": ["של", "את", "על", "לא", "הוא", "זה", "עם", "כי", "גם", "היא", "אבל", "אם"],
+}
+UNKNOWN_LANGUAGE = "und"
+# Running text is a third function words or so; a stray hash collision isn't
+LANGUAGE_MIN_SHARE = 0.02
+
+# Columns of tokens seen so far, per feature count; news vocabulary repeats
+# heavily, so most tokens are hashed once per process. Batches of several
+# crawlers may hash at once, so a full cache is replaced, never cleared
+# under a batch still reading it.
+_column_cache = {}
+COLUMN_CACHE_SIZE = 500_000
+
+
+def normalize(text):
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text):
+    return TOKEN.findall(normalize(text))
+
+
+def _columns(tokens, features):
+    """Dict mapping each of ``tokens`` (and others) to its column.
+
+    Only tokens not hashed before are hashed, each once, however often they
+    occur in ``tokens``.
+    """
+    columns = _column_cache.setdefault(features, {})
+    tokens = set(tokens)
+    missing = tokens.difference(columns)
+    if len(columns) + len(missing) > COLUMN_CACHE_SIZE:
+        columns = _column_cache[features] = {}
+        missing = tokens
+    for token in missing:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        columns[token] = int.from_bytes(digest, "little") % features
+    return columns
+
+
+def term_counts(texts, features):
+    """CSR matrix of hashed term counts, one row per text."""
+    tokens = [tokenize(text) for text in texts]
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(texts))
+    # The batch's distinct tokens are hashed in one go, then every token is
+    # looked up from C instead of going through a Python loop
+    columns = _columns(chain.from_iterable(tokens), features)
+    columns = np.fromiter(
+        map(columns.__getitem__, chain.from_iterable(tokens)),
+        dtype=np.int64,
+        count=int(lengths.sum()),
+    )
+
+    # One sort over (row, column) keys counts every term of the batch and
+    # leaves them in CSR order
+    rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    keys, counts = np.unique(rows * features + columns, return_counts=True)
+    indptr = np.searchsorted(keys, np.arange(len(texts) + 1, dtype=np.int64) * features)
+    return csr_matrix(
+        (counts.astype(np.int32), (keys % features).astype(np.int32), indptr.astype(np.int32)),
+        shape=(len(texts), features),
+    )
+
+
+def languages(matrix, features, tokens):
+    """Guess each row's language from its stopword counts."""
+    codes = list(STOPWORDS)
+    columns = _columns(chain.from_iterable(STOPWORDS.values()), features)
+    hits = np.column_stack(
+        [
+            np.asarray(matrix[:, [columns[w] for w in STOPWORDS[code]]].sum(axis=1)).ravel()
+            for code in codes
+        ]
+    )
+    guesses = np.array(codes)[hits.argmax(axis=1)]
+    best = hits.max(axis=1)
+    known = (best > 0) & (best >= LANGUAGE_MIN_SHARE * tokens)
+    return np.where(known, guesses, UNKNOWN_LANGUAGE).astype("U3")
+
+
+def features(texts, n_features):
+    """Term count matrix and per-text statistics of a batch of texts."""
+    matrix = term_counts(texts, n_features)
+    tokens = np.asarray(matrix.sum(axis=1), dtype=np.int32).ravel()
+    statistics = {
+        "tokens": tokens,
+        "characters": np.array([len(text) for text in texts], dtype=np.int32),
+        "terms": np.diff(matrix.indptr).astype(np.int32),
+        "language": languages(matrix, n_features, tokens),
+    }
+    return matrix, statistics
+
+
+class FeatureWriter:
+    """Write batches of article features under ``directory``, one numbered
+    subdirectory per batch, continuing after the batches already there."""
+
+    def __init__(self, directory, n_features):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.n_features = n_features
+        numbers = [int(p.name) for p in self.directory.iterdir() if p.name.isdigit()]
+        self.next_batch = max(numbers, default=0) + 1
+
+    def reserve(self):
+        """Number the next batch; call from a single thread."""
+        number, self.next_batch = self.next_batch, self.next_batch + 1
+        return number
+
+    def write(self, number, urls, texts):
+        matrix, statistics = features(texts, self.n_features)
+        arrays = {
+            "data": matrix.data,
+            "indices": matrix.indices,
+            "indptr": matrix.indptr,
+            **statistics,
+        }
+        meta = {"features": self.n_features, "shape": list(matrix.shape), "urls": list(urls)}
+
+        # Written aside and renamed, so readers never see half a batch
+        path = self.directory / f"{number:06d}"
+        temporary = self.directory / f".{number:06d}.tmp"
+        temporary.mkdir()
+        for name, array in arrays.items():
+            np.save(temporary / f"{name}.npy", array)
+        (temporary / "meta.json").write_text(json.dumps(meta))
+        os.replace(temporary, path)
+        return path
+
+
+def load_batch(path, mmap_mode="r"):
+    """Return the (term count matrix, URLs, statistics) of a written batch.
+
+    The arrays are memory-mapped rather than read, and the matrix's data,
+    indices and indptr are those memory maps themselves.
+    """
+    path = Path(path)
+    meta = json.loads((path / "meta.json").read_text())
+
+    def load(name):
+        return np.load(path / f"{name}.npy", mmap_mode=mmap_mode)
+
+    # The (data, indices, indptr) constructor may copy its arrays, e.g. to
+    # change their index dtype, so the arrays are put into an empty matrix
+    data = load("data")
+    matrix = csr_matrix(tuple(meta["shape"]), dtype=data.dtype)
+    matrix.data, matrix.indices, matrix.indptr = data, load("indices"), load("indptr")
+    matrix.check_format(full_check=False)
+    statistics = {name: load(name) for name in ("tokens", "characters", "terms", "language")}
+    return matrix, meta["urls"], statistics
+
+
+def load_batches(directory, mmap_mode="r"):
+    """Yield load_batch for every batch written under ``directory``."""
+    for path in sorted(Path(directory).iterdir()):
+        if path.name.isdigit():
+            yield load_batch(path, mmap_mode)
@@ -0,0 +1,70 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ExtractionExecutor:
+    """Runs site extractors, optionally in a process pool.
+
+    With EXTRACTION_PROCESSES = 0 extractors run inline on the reactor thread.
+    Otherwise the response body is shipped to a worker process, and at most
+    EXTRACTION_MAX_PENDING extractions are in flight; further callers wait,
+    which holds their responses in the scraper instead of piling up work.
+    """
+
+    def __init__(self, processes, max_pending, stats):
+        self.pool = None
+        if processes:
+            # Forking the crawler would copy its threads' locks in whatever
+            # state they are in; workers start from a clean server process
+            self.pool = ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context("forkserver")
+            )
+        self.max_pending = max_pending
+        self.stats = stats
+        self.slots = None
+        self.queued = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            settings.getint("EXTRACTION_PROCESSES"),
+            settings.getint("EXTRACTION_MAX_PENDING"),
+            crawler.stats,
+        )
+
+    async def extract(self, extractor, response):
+        start = time.perf_counter()
+        if self.pool is None:
+            item = extractor(response.url, response.body, response.encoding)
+        else:
+            item = await self._extract_in_pool(extractor, response)
+        self._record_latency(time.perf_counter() - start)
+        return item
+
+    async def _extract_in_pool(self, extractor, response):
+        if self.slots is None:
+            # Created lazily so it binds to the reactor's running loop
+            self.slots = asyncio.Semaphore(self.max_pending)
+
+        self.queued += 1
+        self.stats.max_value("extraction/max_queue_depth", self.queued)
+        try:
+            async with self.slots:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.pool, extractor, response.url, response.body, response.encoding
+                )
+        finally:
+            self.queued -= 1
+
+    def _record_latency(self, seconds):
+        ms = int(seconds * 1000)
+        self.stats.inc_value("extraction/count")
+        self.stats.inc_value("extraction/latency_ms_total", ms)
+        self.stats.max_value("extraction/latency_ms_max", ms)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
@@ -0,0 +1,152 @@
+"""Site article extractors.
+
+These are plain functions of the downloaded page so they can run in another
+process (see summerproject.executor); they must not touch the spider.
+
+Each site is described by an ExtractionSpec whose XPath expressions are
+compiled once at import. A spec's parts are combined into a single union
+expression, so the document is walked once and every node it returns (title,
+paragraphs, metadata script) is dispatched by tag in document order.
+"""
+
+import re
+from functools import lru_cache
+
+from lxml import etree
+
+from summerproject.partialjson import extract_paths
+
+FIRST_TEXT = etree.XPath("text()")
+STRING = etree.XPath("string()")
+
+
+@lru_cache(maxsize=None)
+def _parser(encoding):
+    return etree.HTMLParser(encoding=encoding)
+
+
+class ExtractionSpec:
+    def __init__(self, title, paragraphs, metadata, title_tag):
+        self.nodes = etree.XPath(f"{title} | {paragraphs} | {metadata}")
+        self.title_tag = title_tag
+
+    def collect(self, body, encoding):
+        """Return the title node, paragraph nodes and metadata scripts."""
+        root = etree.fromstring(body, _parser(encoding))
+        title = None
+        paragraphs = []
+        scripts = []
+        for node in self.nodes(root):
+            tag = node.tag
+            if tag == "p":
+                paragraphs.append(node)
+            elif tag == "script":
+                scripts.append(node.text or "")
+            elif tag == self.title_tag and title is None:
+                title = node
+        return title, paragraphs, scripts
+
+
+def _title_text(node):
+    # The first text node of the title element, like ::text().get()
+    return FIRST_TEXT(node)[0].strip()
+
+
+ABC_DATA_IDENTIFIER = "window['__abcnews__']="
+ABC_STORY = "page.content.story.story"
+ABC_STORY_PATHS = [
+    f"{ABC_STORY}.publishedDate",
+    f"{ABC_STORY}.authorsStr",
+    f"{ABC_STORY}.wordCount",
+]
+ABC_SPEC = ExtractionSpec(
+    title="//h1/span",
+    paragraphs="//div[@data-testid='prism-article-body']/p",
+    metadata=f'/html/body/script[contains(.,"{ABC_DATA_IDENTIFIER}")]',
+    title_tag="span",
+)
+
+CNN_SPEC = ExtractionSpec(
+    title="//h1[@id='maincontent']",
+    paragraphs="//p[@data-component-name='paragraph']",
+    metadata="/html/head/script[contains(.,'window.CNN = ')]",
+    title_tag="h1",
+)
+CNN_PUBLISHED_DATE = re.compile(" published_date: '(.*)',")
+CNN_AUTHOR = re.compile(" author: '(.*)',")
+CNN_SECTION = re.compile(" section: '(.*)',")
+
+ALJAZEERA_SPEC = ExtractionSpec(
+    title="//main//h1",
+    paragraphs="//main[@id='main-content-area']//p",
+    metadata="/html/head//script[@type='application/ld+json' and @data-reactroot='']",
+    title_tag="h1",
+)
+ALJAZEERA_LD_PATHS = ["@type", "datePublished", "author"]
+
+
+def extract_abc(url, body, encoding):
+    title, paragraphs, scripts = ABC_SPEC.collect(body, encoding)
+    content = " ".join(STRING(p).strip() for p in paragraphs)
+
+    # The page state is hundreds of KB, only scan it as far as the story fields
+    script_block = scripts[0]
+    start = script_block.index(ABC_DATA_IDENTIFIER) + len(ABC_DATA_IDENTIFIER)
+    story_data = extract_paths(script_block, ABC_STORY_PATHS, start)
+
+    return {
+        "title": _title_text(title),
+        "content": content,
+        "publish_date": story_data[f"{ABC_STORY}.publishedDate"],
+        "url": url,
+        "author": story_data[f"{ABC_STORY}.authorsStr"].strip().replace(", ", ","),
+        "word_count": story_data[f"{ABC_STORY}.wordCount"],
+    }
+
+
+def extract_cnn(url, body, encoding):
+    title, paragraphs, scripts = CNN_SPEC.collect(body, encoding)
+    content = " ".join(STRING(p).strip() for p in paragraphs)
+
+    script_block = scripts[0]
+    published_date = CNN_PUBLISHED_DATE.search(script_block).group(1)
+    # TODO: A lot of articles seem to have an empty author field, may need to extract from page content
+    author = CNN_AUTHOR.search(script_block).group(1)
+    affiliation = CNN_SECTION.search(script_block).group(1)
+
+    return {
+        "title": _title_text(title),
+        "content": content,
+        "publish_date": published_date,
+        "url": url,
+        "author": author,
+        "word_count": len(content.split()),
+        "affiliation": affiliation,
+    }
+
+
+def extract_aljazeera(url, body, encoding):
+    title, paragraphs, scripts = ALJAZEERA_SPEC.collect(body, encoding)
+    content = " ".join(
+        "".join(e for e in p.itertext() if not e.isspace()).strip() for p in paragraphs
+    )
+
+    react_root = next(
+        r
+        for r in (extract_paths(x, ALJAZEERA_LD_PATHS) for x in scripts)
+        if r["@type"] == "NewsArticle"
+    )
+
+    author_data = react_root["author"]
+    if not isinstance(author_data, list):
+        author_data = [author_data]
+    authors = ",".join(x["name"] for x in author_data)
+
+    return {
+        "title": _title_text(title),
+        "content": content,
+        "publish_date": react_root["datePublished"],
+        "url": url,
+        "author": authors,
+        "word_count": len(content.split()),
+    }
@@ -0,0 +1,239 @@
+"""Shared crawl frontier, so several workers can run the same spider.
+
+The queue, the dupefilter's seen set and the leases live in a Redis
+compatible server at FRONTIER_URL, under FRONTIER_KEY_PREFIX:<spider>.
+Dequeuing a request leases it to the worker for FRONTIER_LEASE_SECONDS. The
+worker renews its leases while it holds them and acks each request once the
+engine is done with it, after the requests its callback yielded are queued. A
+crashed worker stops renewing, so its
+requests go back on the queue when their leases expire, up to
+FRONTIER_MAX_LEASES times. A worker holds at most FRONTIER_PREFETCH leases,
+so it doesn't take more than it can download while other workers sit idle.
+"""
+
+import logging
+import pickle
+import time
+from collections import deque
+
+from scrapy.utils.request import request_from_dict
+from twisted.internet import task
+
+KEYS = ("queue", "leases", "requests", "scores", "attempts", "sequence", "seen")
+
+# KEYS: queue, requests, scores, sequence; ARGV: payload, priority
+PUSH_SCRIPT = """
+local id = redis.call('INCR', KEYS[4])
+-- Higher priority first, then first in first out
+local score = -tonumber(ARGV[2]) * 1e9 + id
+redis.call('HSET', KEYS[2], id, ARGV[1])
+redis.call('HSET', KEYS[3], id, score)
+redis.call('ZADD', KEYS[1], score, id)
+return id
+"""
+
+# KEYS: queue, leases, requests, scores, attempts
+# ARGV: now, lease deadline, max leases
+POP_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    if redis.call('HINCRBY', KEYS[5], id, 1) >= tonumber(ARGV[3]) then
+        redis.call('HDEL', KEYS[3], id)
+        redis.call('HDEL', KEYS[4], id)
+        redis.call('HDEL', KEYS[5], id)
+    else
+        redis.call('ZADD', KEYS[1], redis.call('HGET', KEYS[4], id), id)
+    end
+end
+
+local popped = redis.call('ZPOPMIN', KEYS[1])
+if #popped == 0 then
+    return false
+end
+local id = popped[1]
+redis.call('ZADD', KEYS[2], ARGV[2], id)
+return {id, redis.call('HGET', KEYS[3], id)}
+"""
+
+# KEYS: leases, requests, scores, attempts; ARGV: id
+ACK_SCRIPT = """
+-- A lease that already expired was handed to another worker, leave it be
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    redis.call('HDEL', KEYS[3], ARGV[1])
+    redis.call('HDEL', KEYS[4], ARGV[1])
+end
+"""
+
+# KEYS: queue, leases, scores; ARGV: ids
+RELEASE_SCRIPT = """
+for _, id in ipairs(ARGV) do
+    if redis.call('ZREM', KEYS[2], id) == 1 then
+        redis.call('ZADD', KEYS[1], redis.call('HGET', KEYS[3], id), id)
+    end
+end
+"""
+
+
+def connect(url):
+    # Only distributed crawls need redis, so don't require it otherwise
+    try:
+        import redis
+    except ImportError:
+        raise ImportError("FRONTIER_URL needs the redis package") from None
+    return redis.Redis.from_url(url)
+
+
+class Frontier:
+    """Queue, seen set and leases for one spider in a Redis compatible store."""
+
+    def __init__(self, client, key, lease_seconds, max_leases):
+        self.client = client
+        self.keys = {name: f"{key}:{name}" for name in KEYS}
+        self.lease_seconds = lease_seconds
+        self.max_leases = max_leases
+        self._push = client.register_script(PUSH_SCRIPT)
+        self._pop = client.register_script(POP_SCRIPT)
+        self._ack = client.register_script(ACK_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    def _key(self, *names):
+        return [self.keys[name] for name in names]
+
+    def add_seen(self, fingerprint):
+        """Record a request fingerprint, returning False if it was already seen."""
+        return bool(self.client.sadd(self.keys["seen"], fingerprint))
+
+    def push(self, payload, priority):
+        return self._push(self._key("queue", "requests", "scores", "sequence"), [payload, priority])
+
+    def pop(self):
+        """Lease the next request, returning (id, payload) or None."""
+        now = time.time()
+        popped = self._pop(
+            self._key("queue", "leases", "requests", "scores", "attempts"),
+            [now, now + self.lease_seconds, self.max_leases],
+        )
+        return tuple(popped) if popped else None
+
+    def ack(self, request_id):
+        self._ack(self._key("leases", "requests", "scores", "attempts"), [request_id])
+
+    def renew(self, request_ids):
+        deadline = time.time() + self.lease_seconds
+        self.client.zadd(self.keys["leases"], {i: deadline for i in request_ids}, xx=True)
+
+    def release(self, request_ids):
+        """Put leased requests straight back on the queue."""
+        self._release(self._key("queue", "leases", "scores"), list(request_ids))
+
+    def pending(self):
+        # Leased requests count, they come back if their worker dies
+        with self.client.pipeline() as pipe:
+            pipe.zcard(self.keys["queue"])
+            pipe.zcard(self.keys["leases"])
+            return sum(pipe.execute())
+
+    def clear(self):
+        self.client.delete(*self.keys.values())
+
+
+class FrontierScheduler:
+    """Scheduler backed by a shared Frontier instead of in-process queues.
+
+    Requests whose meta can't be pickled stay in a local queue, like the
+    default scheduler does when its disk queue can't take them.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.url = settings.get("FRONTIER_URL")
+        self.prefix = settings.get("FRONTIER_KEY_PREFIX")
+        self.lease_seconds = settings.getfloat("FRONTIER_LEASE_SECONDS")
+        self.max_leases = settings.getint("FRONTIER_MAX_LEASES")
+        self.persist = settings.getbool("FRONTIER_PERSIST")
+        self.prefetch = settings.getint("FRONTIER_PREFETCH")
+        if not self.url:
+            raise ValueError("FrontierScheduler needs FRONTIER_URL")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def open(self, spider):
+        self.spider = spider
+        self.fingerprinter = self.crawler.request_fingerprinter
+        self.frontier = Frontier(
+            connect(self.url), f"{self.prefix}:{spider.name}", self.lease_seconds, self.max_leases
+        )
+        self.local = deque()
+        self.leased = {}
+
+        self.renewer = task.LoopingCall(self.renew)
+        self.renewer.start(self.lease_seconds / 3, now=False)
+        logging.info(f"Using shared frontier {self.prefix}:{spider.name} at {self.url}")
+
+    def close(self, reason):
+        if self.renewer.running:
+            self.renewer.stop()
+        if self.leased:
+            # Hand back whatever this worker didn't get to
+            self.frontier.release(self.leased)
+        if reason == "finished" and not self.persist and not self.frontier.pending():
+            self.frontier.clear()
+
+    def has_pending_requests(self):
+        self.ack_finished()
+        return bool(self.local) or self.frontier.pending() > 0
+
+    def enqueue_request(self, request):
+        if not request.dont_filter:
+            fingerprint = self.fingerprinter.fingerprint(request)
+            if not self.frontier.add_seen(fingerprint):
+                self.stats.inc_value("dupefilter/filtered", spider=self.spider)
+                return False
+
+        try:
+            payload = pickle.dumps(request.to_dict(spider=self.spider), protocol=4)
+        except Exception as e:
+            logging.debug(f"Keeping unserializable request local: {request} ({e})")
+            self.local.append(request)
+            self.stats.inc_value("scheduler/enqueued/local", spider=self.spider)
+        else:
+            self.frontier.push(payload, request.priority)
+            self.stats.inc_value("scheduler/enqueued/frontier", spider=self.spider)
+        self.stats.inc_value("scheduler/enqueued", spider=self.spider)
+        return True
+
+    def next_request(self):
+        self.ack_finished()
+        if self.local:
+            self.stats.inc_value("scheduler/dequeued", spider=self.spider)
+            return self.local.popleft()
+        if len(self.leased) >= self.prefetch:
+            return None
+
+        popped = self.frontier.pop()
+        if popped is None:
+            return None
+        request_id, payload = popped
+        request = request_from_dict(pickle.loads(payload), spider=self.spider)
+        self.leased[request_id] = request
+        self.stats.inc_value("scheduler/dequeued", spider=self.spider)
+        return request
+
+    def ack_finished(self):
+        # The engine holds a request in progress through its download and
+        # callback, whatever the outcome, so one it dropped is done with
+        in_progress = self.crawler.engine.slot.inprogress
+        for request_id, request in list(self.leased.items()):
+            if request not in in_progress:
+                del self.leased[request_id]
+                self.frontier.ack(request_id)
+
+    def renew(self):
+        if self.leased:
+            self.frontier.renew(self.leased)
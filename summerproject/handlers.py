@@ -0,0 +1,97 @@
+import logging
+import time
+
+from scrapy import signals
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.signalmanager import SignalManager
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import defer
+
+
+class BrowserCrawler:
+    """The crawler as the Playwright handler sees it, but with signals of its
+    own, so sending engine_started there launches Playwright and nothing else."""
+
+    def __init__(self, crawler):
+        self._crawler = crawler
+        self.signals = SignalManager(crawler)
+
+    def __getattr__(self, name):
+        return getattr(self._crawler, name)
+
+
+class FastPathDownloadHandler:
+    """Download handler that only uses the browser for Playwright requests.
+
+    Everything else (article pages, mostly) goes over a pooled keep-alive
+    HTTP/1.1 connection pool, or multiplexed HTTP/2 for https hosts when
+    FAST_PATH_HTTP2 is enabled.
+
+    Playwright is imported and its driver started on the first Playwright
+    request, so crawls that never render, and commands that never crawl,
+    don't pay for it.
+    """
+
+    lazy = False
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.browser = None
+        self.browser_started = None
+
+        self.http = HTTP11DownloadHandler(settings, crawler)
+        connections = settings.getint("FAST_PATH_CONNECTIONS_PER_HOST")
+        if connections:
+            self.http._pool.maxPersistentPerHost = connections
+
+        self.h2 = None
+        if settings.getbool("FAST_PATH_HTTP2"):
+            try:
+                from scrapy.core.downloader.handlers.http2 import H2DownloadHandler
+            except ImportError:
+                logging.warning("FAST_PATH_HTTP2 needs the h2 package, using HTTP/1.1")
+            else:
+                self.h2 = H2DownloadHandler(settings, crawler)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def download_request(self, request, spider):
+        # Called when a download slot starts the transfer, unlike the
+        # request_reached_downloader signal which fires on entering its queue.
+        # Wall clock time, like the other stamps in meta that outlive the process.
+        request.meta["download_started"] = time.time()
+        if request.meta.get("playwright"):
+            return deferred_from_coro(self._download_in_browser(request, spider))
+        # Scrapy only speaks HTTP/2 over TLS
+        if self.h2 is not None and urlparse_cached(request).scheme == "https":
+            return self.h2.download_request(request, spider)
+        return self.http.download_request(request, spider)
+
+    def _start_browser(self):
+        from scrapy_playwright.handler import ScrapyPlaywrightDownloadHandler
+
+        # It starts Playwright on engine_started, which may be yet to come or
+        # long gone, so it gets that signal now, once
+        crawler = BrowserCrawler(self.crawler)
+        self.browser = ScrapyPlaywrightDownloadHandler.from_crawler(crawler)
+        self.browser_started = maybe_deferred_to_future(
+            crawler.signals.send_catch_log_deferred(signals.engine_started)
+        )
+
+    async def _download_in_browser(self, request, spider):
+        if self.browser is None:
+            self._start_browser()
+        await self.browser_started
+        return await maybe_deferred_to_future(self.browser.download_request(request, spider))
+
+    @defer.inlineCallbacks
+    def close(self):
+        if self.browser is not None:
+            yield self.browser.close()
+        yield self.http.close()
+        if self.h2 is not None:
+            yield self.h2.close()
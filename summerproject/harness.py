@@ -0,0 +1,336 @@
+"""Synthetic clones of the news sites for offline crawl benchmarks.
+
+Each clone serves a generated listing and articles with the DOM the spiders
+and extractors expect from the real site. Result pages are rendered on the
+server, so sharded listings work over plain HTTP, and clicking "Next" or
+"Show more" in a browser swaps or appends the next page's cards in place, like
+the real single-page listings. Everything is generated from a seed, so runs
+are reproducible.
+"""
+
+import abc
+import json
+import math
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from html import escape
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+TOPIC_WORDS = ["israel", "gaza", "hamas", "palestinian", "ceasefire", "hostages", "aid"]
+HEADLINES = [
+    "Gaza talks continue as aid waits at crossing",
+    "Israel weighs ceasefire proposal",
+    "Hamas says hostages deal is close",
+    "Palestinian officials urge restraint",
+    "Aid trucks reach Gaza after delay",
+]
+SYLLABLES = ["ka", "ro", "mi", "tel", "san", "du", "ver", "lo", "pan", "est", "ri", "on"]
+NEWEST = date(2024, 9, 30)
+
+# Clicking an element with data-next loads that URL and, like the real
+# listings, replaces every [data-swap] element and grows every [data-append]
+# one with its counterpart from the new page
+PAGER_JS = """
+document.addEventListener("click", async event => {
+    const trigger = event.target.closest("[data-next]");
+    if (!trigger) return;
+    event.preventDefault();
+    const loading = document.createElement("h3");
+    loading.textContent = "Loading...";
+    document.body.append(loading);
+
+    const response = await fetch(trigger.dataset.next);
+    const fresh = new DOMParser().parseFromString(await response.text(), "text/html");
+    for (const old of document.querySelectorAll("[data-swap]")) {
+        const replacement = fresh.querySelector(`[data-swap="${old.dataset.swap}"]`);
+        replacement ? old.replaceWith(document.adoptNode(replacement)) : old.remove();
+    }
+    for (const feed of document.querySelectorAll("[data-append]")) {
+        const more = fresh.querySelector(`[data-append="${feed.dataset.append}"]`);
+        if (more) feed.append(...[...more.children].map(node => document.adoptNode(node)));
+    }
+    loading.remove();
+});
+"""
+
+
+class SiteClone(abc.ABC):
+    """Listing pages and articles of one generated site."""
+
+    # Captures the article number in an article path
+    article_path_pattern = None
+
+    def __init__(self, listing_pages, articles, seed=0):
+        self.listing_pages = listing_pages
+        self.articles = articles
+        self.per_page = max(1, math.ceil(articles / listing_pages))
+        self.seed = seed
+        rng = random.Random(seed)
+        # Enough distinct words that articles don't look like near-duplicates
+        self.vocabulary = [
+            "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))) + str(i % 97)
+            for i in range(3000)
+        ]
+
+    def route(self, path, query, root):
+        """Return the (status, content type, body) for a request path, or None."""
+        i = self.article_number(path, query)
+        if i is not None and i < self.articles:
+            return self.article(i)
+        page_number = int(query.get("page", ["1"])[0])
+        if self.is_listing(path) and 1 <= page_number <= self.listing_pages:
+            return self.listing(page_number, path, query, root)
+        return None
+
+    def article_number(self, path, query):
+        match = re.match(self.article_path_pattern, path)
+        return int(match.group(1)) if match else None
+
+    def page_articles(self, page_number):
+        first = (page_number - 1) * self.per_page
+        return range(first, min(first + self.per_page, self.articles))
+
+    def next_page_url(self, page_number, path, query):
+        if page_number >= self.listing_pages:
+            return None
+        query = {name: values[0] for name, values in query.items()}
+        query["page"] = page_number + 1
+        return f"{path}?{urlencode(query)}"
+
+    def headline(self, i):
+        return f"{HEADLINES[i % len(HEADLINES)]} {i}"
+
+    def slug(self, i):
+        return re.sub(r"\W+", "-", self.headline(i).lower())
+
+    def published(self, i):
+        # Newest first, spread over a year
+        return NEWEST - timedelta(days=i * 365 // max(self.articles, 1))
+
+    def paragraphs(self, i):
+        rng = random.Random(self.seed * 1_000_003 + i)
+        paragraphs = []
+        for _ in range(rng.randint(6, 12)):
+            words = rng.choices(self.vocabulary, k=rng.randint(40, 90))
+            words[rng.randrange(len(words))] = rng.choice(TOPIC_WORDS)
+            paragraphs.append(" ".join(words).capitalize() + ".")
+        return paragraphs
+
+    @abc.abstractmethod
+    def is_listing(self, path):
+        """Whether ``path`` is one of the site's listing pages."""
+
+    @abc.abstractmethod
+    def listing(self, page_number, path, query, root):
+        """The (status, content type, body) of a listing result page."""
+
+    @abc.abstractmethod
+    def article(self, i):
+        """The (status, content type, body) of article ``i``."""
+
+
+def _html(head, body):
+    page = (
+        "<!DOCTYPE html>\n<html lang='en'><head><meta charset='utf-8'>"
+        f"{head}</head><body>{body}</body></html>"
+    )
+    return 200, "text/html; charset=utf-8", page.encode("utf-8")
+
+
+class AbcClone(SiteClone):
+    def article_number(self, path, query):
+        # Stories are addressed by id, the slug is decoration
+        if path.startswith("/International/") and query.get("id", [""])[0].isdigit():
+            return int(query["id"][0])
+        return None
+
+    def is_listing(self, path):
+        return path == "/search"
+
+    def listing(self, page_number, path, query, root):
+        cards = "".join(
+            "<div class='ContentRoll__Item'><h2 class='ContentRoll__Headline'>"
+            f"<a href='{root}/International/{self.slug(i)}/story?id={i}'>"
+            f"{escape(self.headline(i))}</a></h2>"
+            f"<div class='ContentRoll__Date'>{self.published(i):%b %d, %Y}</div></div>"
+            for i in self.page_articles(page_number)
+        )
+        pager = ""
+        next_url = self.next_page_url(page_number, path, query)
+        if next_url:
+            pager = (
+                f"<nav data-swap='pager'><a href='{escape(next_url)}'"
+                f" data-next='{escape(next_url)}'>Next</a></nav>"
+            )
+        return _html(
+            "<title>Search - ABC News</title>",
+            f"<section class='ContentRoll' data-swap='results'>{cards}</section>{pager}"
+            f"<script>{PAGER_JS}</script>",
+        )
+
+    def article(self, i):
+        story = {
+            "publishedDate": self.published(i).strftime("%a %b %d, %Y"),
+            "authorsStr": "Jane Doe, John Roe",
+            "wordCount": sum(len(p.split()) for p in self.paragraphs(i)),
+        }
+        state = {"page": {"content": {"story": {"story": story}}}}
+        paragraphs = "".join(f"<p>{p}</p>" for p in self.paragraphs(i))
+        return _html(
+            f"<title>{escape(self.headline(i))} - ABC News</title>",
+            f"<main><article><h1><span>{escape(self.headline(i))}</span></h1>"
+            f"<div data-testid='prism-article-body'>{paragraphs}</div></article></main>"
+            f"<script>window['__abcnews__']={json.dumps(state)};</script>",
+        )
+
+
+class CnnClone(SiteClone):
+    article_path_pattern = r"/\d{4}/\d{2}/\d{2}/world/.*-(\d+)/index\.html$"
+
+    def is_listing(self, path):
+        return path == "/search"
+
+    def listing(self, page_number, path, query, root):
+        cards = "".join(
+            "<div data-component-name='card'"
+            f" data-open-link='{root}{self.article_path(i)}'>"
+            f"<span class='container__headline-text'>{escape(self.headline(i))}</span>"
+            f"<div class='container__date'>{self.published(i):%b %d, %Y}</div></div>"
+            for i in self.page_articles(page_number)
+        )
+        next_url = self.next_page_url(page_number, path, query)
+        if next_url:
+            arrow = (
+                "<div class='pagination-arrow-right text-active'"
+                f" data-next='{escape(next_url)}'>&gt;</div>"
+            )
+        else:
+            arrow = "<div class='pagination-arrow-right'>&gt;</div>"
+        return _html(
+            "<title>Search | CNN</title>",
+            f"<div data-swap='results'><div data-editable='cards'>{cards}</div></div>"
+            f"<div class='pagination' data-swap='pager'>{arrow}</div>"
+            f"<script>{PAGER_JS}</script>",
+        )
+
+    def article_path(self, i):
+        return f"/{self.published(i):%Y/%m/%d}/world/{self.slug(i)}/index.html"
+
+    def article(self, i):
+        paragraphs = "".join(
+            f"<p class='paragraph' data-component-name='paragraph'>{p}</p>"
+            for p in self.paragraphs(i)
+        )
+        model = (
+            "window.CNN = {\n  contentModel: {\n    author: 'Jane Doe',\n"
+            f"    published_date: '{self.published(i)}T14:00:00.000Z',\n"
+            "    section: 'world',\n  },\n};"
+        )
+        return _html(
+            f"<title>{escape(self.headline(i))} | CNN</title><script>{model}</script>",
+            f"<h1 id='maincontent'>{escape(self.headline(i))}</h1>"
+            f"<div class='article__content'>{paragraphs}</div>",
+        )
+
+
+class AljazeeraClone(SiteClone):
+    article_path_pattern = r"/news/\d{4}/\d+/\d+/.*-(\d+)$"
+
+    def is_listing(self, path):
+        return path == "/tag/israel-palestine-conflict/"
+
+    def listing(self, page_number, path, query, root):
+        cards = "".join(
+            "<article class='gc u-clickable-card'><h3 class='gc__title'>"
+            f"<a class='u-clickable-card__link' href='{self.article_path(i)}'>"
+            f"<span>{escape(self.headline(i))}</span></a></h3>"
+            "<div class='date-simple'>"
+            f"<span aria-hidden='true'>{self.card_date(i)}</span></div></article>"
+            for i in self.page_articles(page_number)
+        )
+        button = ""
+        next_url = self.next_page_url(page_number, path, query)
+        if next_url:
+            button = (
+                f"<button data-testid='show-more-button' data-swap='pager'"
+                f" data-next='{escape(next_url)}'>Show more</button>"
+            )
+        return _html(
+            "<title>Israel-Palestine conflict | Al Jazeera</title>",
+            f"<main><section data-append='feed'>{cards}</section>{button}</main>"
+            f"<script>{PAGER_JS}</script>",
+        )
+
+    def card_date(self, i):
+        published = self.published(i)
+        return f"{published.day} {published:%b %Y}"
+
+    def article_path(self, i):
+        published = self.published(i)
+        return f"/news/{published.year}/{published.month}/{published.day}/{self.slug(i)}"
+
+    def article(self, i):
+        data = {
+            "@context": "https://schema.org",
+            "@type": "NewsArticle",
+            "headline": self.headline(i),
+            "datePublished": f"{self.published(i)}T14:00:00Z",
+            "author": {"@type": "Person", "name": "John Roe"},
+        }
+        paragraphs = "".join(f"<p>{p}</p>" for p in self.paragraphs(i))
+        return _html(
+            f"<title>{escape(self.headline(i))} | Al Jazeera</title>"
+            f"<script type='application/ld+json' data-reactroot=''>{json.dumps(data)}</script>",
+            f"<main id='main-content-area'><header><h1>{escape(self.headline(i))}</h1></header>"
+            f"<div class='wysiwyg'>{paragraphs}</div></main>",
+        )
+
+
+CLONES = {
+    "abc": AbcClone,
+    "cnn": CnnClone,
+    "aljazeera": AljazeeraClone,
+}
+
+
+def clone_handler(clone, latency, error_rate, seed=0):
+    """Handler serving ``clone`` with ``latency`` seconds of delay on average,
+    answering 503 to ``error_rate`` of the article requests."""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class CloneHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            split = urlsplit(self.path)
+            root = f"http://{self.headers['Host']}"
+            result = clone.route(split.path, parse_qs(split.query), root)
+            with lock:
+                delay = latency * (0.5 + rng.random())
+                failed = rng.random() < error_rate
+            time.sleep(delay)
+
+            # The listing pager can't retry, so only articles fail
+            if result is None:
+                status, content_type, body = 404, "text/plain", b"Not found"
+            elif failed and not clone.is_listing(split.path):
+                status, content_type, body = 503, "text/plain", b"Unavailable"
+            else:
+                status, content_type, body = result
+
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CloneHandler
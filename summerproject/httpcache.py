@@ -0,0 +1,164 @@
+"""HTTP cache storage and policy for plain and browser-rendered responses."""
+
+import logging
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+
+from scrapy.exceptions import IgnoreRequest
+from scrapy.extensions.httpcache import RFC2616Policy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+VALIDATORS = (b"If-Modified-Since", b"If-None-Match")
+
+
+def is_rendered(request):
+    return bool(request.meta.get("playwright") or request.meta.get("splash"))
+
+
+class SqliteCacheStorage:
+    """Cache responses in one SQLite file per spider under HTTPCACHE_DIR.
+
+    Entries are keyed by request fingerprint and whether a browser rendered
+    the response, so the plain and rendered fetches of an escalated URL are
+    kept apart. Bodies are zlib-compressed, and once more than
+    HTTPCACHE_MAX_BYTES is stored the least recently used entries are evicted.
+    """
+
+    def __init__(self, settings):
+        self.cachedir = Path(data_path(settings["HTTPCACHE_DIR"], createdir=True))
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.max_bytes = settings.getint("HTTPCACHE_MAX_BYTES")
+
+    def open_spider(self, spider):
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        self.stats = spider.crawler.stats
+        path = self.cachedir / f"{spider.name}.sqlite3"
+        logging.debug(f"Using SQLite cache storage in {path}")
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " url TEXT,"
+            " status INTEGER,"
+            " headers BLOB,"
+            " body BLOB,"
+            " size INTEGER,"
+            " stored_at REAL,"
+            " used_at REAL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)"
+        )
+        self.connection.commit()
+        self.size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def close_spider(self, spider):
+        self.connection.commit()
+        self.connection.close()
+
+    def _key(self, request):
+        key = self._fingerprinter.fingerprint(request).hex()
+        return f"{key}-rendered" if is_rendered(request) else key
+
+    def retrieve_response(self, spider, request):
+        key = self._key(request)
+        row = self.connection.execute(
+            "SELECT url, status, headers, body, stored_at FROM responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        url, status, raw_headers, body, stored_at = row
+        if 0 < self.expiration_secs < time.time() - stored_at:
+            return None
+
+        # Committed along with the next stored response
+        self.connection.execute(
+            "UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key)
+        )
+        headers = Headers(headers_raw_to_dict(raw_headers))
+        body = zlib.decompress(body)
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        key = self._key(request)
+        raw_headers = headers_dict_to_raw(response.headers)
+        body = zlib.compress(response.body)
+        size = len(raw_headers) + len(body)
+
+        previous = self.connection.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.url, response.status, raw_headers, body, size, now, now),
+            )
+        self.size += size - (previous[0] if previous else 0)
+
+        if self.max_bytes and self.size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        # Shrink to 90% so a full cache doesn't evict on every store
+        target = self.max_bytes * 0.9
+        evicted = 0
+        with self.connection:
+            while self.size > target:
+                rows = self.connection.execute(
+                    "SELECT key, size FROM responses ORDER BY used_at LIMIT 100"
+                ).fetchall()
+                if not rows:
+                    break
+                self.connection.executemany(
+                    "DELETE FROM responses WHERE key = ?", [(key,) for key, _ in rows]
+                )
+                self.size -= sum(size for _, size in rows)
+                evicted += len(rows)
+        self.stats.inc_value("httpcache/evicted", evicted)
+
+
+class ReplayPolicy(RFC2616Policy):
+    """RFC 2616 caching with an offline replay mode.
+
+    Stale plain responses are revalidated with If-None-Match and
+    If-Modified-Since. A browser can't make a conditional page render, so
+    stale rendered responses are rendered again instead. With HTTPCACHE_OFFLINE
+    every cached response is served as is, and requests that can't be cached,
+    such as browser listings handing their live page to the spider, are
+    ignored rather than sent to the network.
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.offline = settings.getbool("HTTPCACHE_OFFLINE")
+
+    def should_cache_request(self, request):
+        # A live page handed to the spider can't be replayed from disk
+        cacheable = not request.meta.get("playwright_include_page")
+        cacheable = cacheable and super().should_cache_request(request)
+        if not cacheable and self.offline:
+            raise IgnoreRequest(f"Not replayable from the cache: {request.url}")
+        return cacheable
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        if self.offline:
+            return True
+        fresh = super().is_cached_response_fresh(cachedresponse, request)
+        if not fresh and is_rendered(request):
+            for header in VALIDATORS:
+                request.headers.pop(header, None)
+        return fresh
@@ -0,0 +1,171 @@
+"""Resident memory of this process and the browsers it started.
+
+Read from /proc, so it is only available on Linux; elsewhere the functions
+return None.
+"""
+
+import logging
+import os
+
+from scrapy import signals
+
+PROC = "/proc"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _stat_fields(pid):
+    with open(f"{PROC}/{pid}/stat") as f:
+        stat = f.read()
+    # The command name can contain spaces and parentheses
+    return stat[stat.rindex(")") + 2 :].split()
+
+
+def _parent_pids():
+    parents = {}
+    for entry in os.scandir(PROC):
+        if not entry.name.isdigit():
+            continue
+        try:
+            fields = _stat_fields(entry.name)
+        except OSError:
+            continue
+        parents[int(entry.name)] = int(fields[1])
+    return parents
+
+
+def descendants(pid):
+    children = {}
+    for child, parent in _parent_pids().items():
+        children.setdefault(parent, []).append(child)
+
+    found = []
+    pending = list(children.get(pid, []))
+    while pending:
+        child = pending.pop()
+        found.append(child)
+        pending.extend(children.get(child, []))
+    return found
+
+
+def rss(pid):
+    """Resident set size of ``pid`` in bytes, or 0 if it has gone away."""
+    try:
+        with open(f"{PROC}/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def cpu_seconds(pid):
+    """User plus system CPU time ``pid`` has used, or 0 if it has gone away."""
+    try:
+        fields = _stat_fields(pid)
+    except OSError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def browser_rss():
+    """Total RSS of every process started below this one, in bytes.
+
+    That is the Playwright driver and the browsers it launched, including a
+    shared browser started by "scrapy crawlall".
+    """
+    if not os.path.isdir(PROC):
+        return None
+    return sum(rss(pid) for pid in descendants(os.getpid()))
+
+
+class MemoryGovernor:
+    """Tell long-lived listing pages when to shed memory.
+
+    A page's JS heap and DOM node count come from the Chrome DevTools
+    Protocol's Performance.getMetrics, the browsers' footprint from
+    browser_rss(). check() reports which of MEMORY_PAGE_HEAP_MB,
+    MEMORY_PAGE_NODES or MEMORY_BROWSER_RSS_MB was exceeded, and the peaks
+    are kept in the stats and logged when the spider closes.
+
+    Browser RSS includes browsers this page doesn't live in, so once it is
+    reported, it is ignored for the next MEMORY_BROWSER_RSS_COOLDOWN checks,
+    twice as many each time it is still over budget after that.
+    """
+
+    def __init__(self, heap_limit, node_limit, rss_limit, rss_cooldown, stats):
+        self.heap_limit = heap_limit
+        self.node_limit = node_limit
+        self.rss_limit = rss_limit
+        self.rss_cooldown = rss_cooldown
+        self.stats = stats
+        self.sessions = {}
+        self.rss_backoff = rss_cooldown
+        self.rss_ignored = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("MEMORY_GOVERNOR_ENABLED"):
+            return None
+        governor = cls(
+            settings.getint("MEMORY_PAGE_HEAP_MB") * 1024**2,
+            settings.getint("MEMORY_PAGE_NODES"),
+            settings.getint("MEMORY_BROWSER_RSS_MB") * 1024**2,
+            settings.getint("MEMORY_BROWSER_RSS_COOLDOWN"),
+            crawler.stats,
+        )
+        crawler.signals.connect(governor.spider_closed, signal=signals.spider_closed)
+        return governor
+
+    async def page_metrics(self, page):
+        from playwright.async_api import Error
+
+        session = self.sessions.get(page)
+        if session is None:
+            try:
+                session = await page.context.new_cdp_session(page)
+                await session.send("Performance.enable")
+            except Error:
+                # Only Chromium speaks CDP
+                return {}
+            self.sessions[page] = session
+            page.on("close", lambda page: self.sessions.pop(page, None))
+        response = await session.send("Performance.getMetrics")
+        return {metric["name"]: metric["value"] for metric in response["metrics"]}
+
+    async def check(self, page):
+        """Sample memory, returning why ``page`` should shed memory or None."""
+        metrics = await self.page_metrics(page)
+        heap = int(metrics.get("JSHeapUsedSize", 0))
+        nodes = int(metrics.get("Nodes", 0))
+        rss = browser_rss() or 0
+
+        self.stats.max_value("memory/peak_page_heap", heap)
+        self.stats.max_value("memory/peak_page_nodes", nodes)
+        self.stats.max_value("memory/peak_browser_rss", rss)
+
+        if self.heap_limit and heap > self.heap_limit:
+            return f"page heap {heap / 1024**2:.0f}MB"
+        if self.node_limit and nodes > self.node_limit:
+            return f"{nodes} DOM nodes"
+        return self._check_rss(rss)
+
+    def _check_rss(self, rss):
+        if not self.rss_limit or rss <= self.rss_limit:
+            self.rss_backoff = self.rss_cooldown
+            self.rss_ignored = 0
+            return None
+        if self.rss_ignored:
+            self.rss_ignored -= 1
+            self.stats.inc_value("memory/browser_rss_ignored")
+            return None
+        self.rss_ignored, self.rss_backoff = self.rss_backoff, self.rss_backoff * 2
+        return f"browser RSS {rss / 1024**2:.0f}MB"
+
+    def spider_closed(self, spider):
+        heap = self.stats.get_value("memory/peak_page_heap", 0)
+        nodes = self.stats.get_value("memory/peak_page_nodes", 0)
+        rss = self.stats.get_value("memory/peak_browser_rss", 0)
+        logging.info(
+            f"Peak memory for {spider.name}: page heap {heap / 1024**2:.0f}MB,"
+            f" {nodes} DOM nodes, browser RSS {rss / 1024**2:.0f}MB"
+        )
@@ -0,0 +1,134 @@
+"""Per-stage timing histograms for a crawl.
+
+The project middlewares of a crawler share one Metrics instance. It keeps a
+histogram per (stage, spider, domain), rewrites them to
+METRICS_DIR/<spider>.json every METRICS_INTERVAL seconds, and logs the
+METRICS_SLOWEST slowest URLs when the spider closes.
+"""
+
+import bisect
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from scrapy import signals
+from twisted.internet import task
+
+MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+BYTE_BUCKETS = tuple(1024 * 4**i for i in range(10))
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th value
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.counts)),
+        }
+
+
+class Metrics:
+    def __init__(self, directory, interval, keep_slowest):
+        self.directory = directory
+        self.interval = interval
+        self.keep_slowest = keep_slowest
+        self.histograms = {}
+        self.slowest = []
+        self._order = itertools.count()
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # Created by whichever middleware asks first, then shared
+        metrics = getattr(crawler, "metrics", None)
+        if metrics is None:
+            settings = crawler.settings
+            metrics = crawler.metrics = cls(
+                settings.get("METRICS_DIR"),
+                settings.getfloat("METRICS_INTERVAL"),
+                settings.getint("METRICS_SLOWEST"),
+            )
+            crawler.signals.connect(metrics.spider_opened, signal=signals.spider_opened)
+            crawler.signals.connect(metrics.spider_closed, signal=signals.spider_closed)
+        return metrics
+
+    def observe(self, stage, spider, domain, value):
+        key = (stage, spider.name, domain)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            bounds = BYTE_BUCKETS if stage == "bytes" else MS_BUCKETS
+            histogram = self.histograms[key] = Histogram(bounds)
+        histogram.observe(value)
+
+    def request_done(self, url, total_ms, stages):
+        entry = (total_ms, next(self._order), url, dict(stages))
+        if len(self.slowest) < self.keep_slowest:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest:
+            heapq.heappushpop(self.slowest, entry)
+
+    def spider_opened(self, spider):
+        if self.directory and self.interval:
+            self.writer = task.LoopingCall(self.write, spider)
+            self.writer.start(self.interval, now=False)
+
+    def write(self, spider):
+        path = Path(self.directory) / f"{spider.name}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "time": time.time(),
+            "histograms": [
+                {"stage": stage, "spider": name, "domain": domain, **histogram.to_dict()}
+                for (stage, name, domain), histogram in sorted(self.histograms.items())
+            ],
+            "slowest": [
+                {"url": url, "total_ms": total_ms, "stages": stages}
+                for total_ms, _, url, stages in sorted(self.slowest, reverse=True)
+            ],
+        }
+        # Written aside and renamed so readers never see a partial file
+        temporary = path.with_suffix(".json.tmp")
+        temporary.write_text(json.dumps(report, indent=1))
+        os.replace(temporary, path)
+
+    def spider_closed(self, spider):
+        if self.writer is not None and self.writer.running:
+            self.writer.stop()
+        if self.directory:
+            self.write(spider)
+
+        logging.info(f"Slowest {len(self.slowest)} URLs:")
+        for total_ms, _, url, stages in sorted(self.slowest, reverse=True):
+            breakdown = ", ".join(f"{stage} {ms:.0f}ms" for stage, ms in stages.items())
+            logging.info(f"{total_ms:8.0f}ms {url} ({breakdown})")
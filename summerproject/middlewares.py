@@ -3,101 +3,509 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import logging
+import statistics
+import time
+
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import HtmlResponse
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import task
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from summerproject.httpcache import is_rendered
+from summerproject.memory import browser_rss
+from summerproject.metrics import Metrics
+from summerproject.relevance import TopicMatcher, vocabulary_digest
+from summerproject.renderers import RENDERERS, url_pattern
+from summerproject.rendering import PageResourceFilter
+
+
+def _timings(request):
+    # Shared by every attempt at a request, since request.replace() copies
+    # meta shallowly. Stamps are wall clock times: meta is pickled into JOBDIR
+    # and frontier queues and may be read by another process.
+    return request.meta.setdefault("metrics", {"start": time.time(), "stages": {}})
+
+
+def _elapsed_ms(since):
+    # Clocks of different workers may disagree a little
+    return max(time.time() - since, 0.0) * 1000
+
 
 class SummerprojectSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    """Time the spider callbacks and the item pipelines.
+
+    Callback time is only counted while the callback is producing output, so
+    a parse_article that awaits extraction includes the extraction but not
+    the time its items spend in the pipelines.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.items = {}
 
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(Metrics.from_crawler(crawler))
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.item_done, signal=signals.item_scraped)
+        crawler.signals.connect(s.item_done, signal=signals.item_dropped)
+        crawler.signals.connect(s.item_done, signal=signals.item_error)
         return s
 
-    def process_spider_input(self, response, spider):
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
-
-        # Should return None or raise an exception.
-        return None
-
     def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+        callback, stages = self._stages(response)
+        elapsed = 0.0
+        items = 0
+        result = iter(result)
+        while True:
+            started = time.perf_counter()
+            try:
+                i = next(result)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - started
+                stages[callback] = elapsed * 1000
+            items += self._track(i, response)
+            yield i
+        self._parsed(response, spider, elapsed, items)
 
-        # Must return an iterable of Request, or item objects.
-        for i in result:
+    async def process_spider_output_async(self, response, result, spider):
+        callback, stages = self._stages(response)
+        elapsed = 0.0
+        items = 0
+        result = result.__aiter__()
+        while True:
+            started = time.perf_counter()
+            try:
+                i = await result.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - started
+                stages[callback] = elapsed * 1000
+            items += self._track(i, response)
             yield i
+        self._parsed(response, spider, elapsed, items)
 
-    def process_spider_exception(self, response, exception, spider):
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
+    def _stages(self, response):
+        callback = getattr(response.request.callback, "__name__", "parse")
+        return callback, _timings(response.request)["stages"]
+
+    def _track(self, i, response):
+        if not is_item(i):
+            return 0
+        self.items[id(i)] = (time.time(), response)
+        return 1
 
-        # Should return either None or an iterable of Request or item objects.
-        pass
+    def _parsed(self, response, spider, elapsed, items):
+        callback, _ = self._stages(response)
+        self.metrics.observe(callback, spider, urlparse_cached(response).hostname, elapsed * 1000)
+        if not items:
+            timings = _timings(response.request)
+            self.metrics.request_done(
+                response.url, _elapsed_ms(timings["start"]), timings["stages"]
+            )
 
-    def process_start_requests(self, start_requests, spider):
-        # Called with the start requests of the spider, and works
-        # similarly to the process_spider_output() method, except
-        # that it doesn’t have a response associated.
+    def item_done(self, item, response, spider, **kwargs):
+        tracked = self.items.pop(id(item), None)
+        if tracked is None:
+            return
+        started, response = tracked
+        elapsed = _elapsed_ms(started)
+        self.metrics.observe("pipeline", spider, urlparse_cached(response).hostname, elapsed)
 
-        # Must return only requests (not items).
-        for r in start_requests:
-            yield r
+        timings = _timings(response.request)
+        timings["stages"]["pipeline"] = elapsed
+        self.metrics.request_done(response.url, _elapsed_ms(timings["start"]), timings["stages"])
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
 
 
 class SummerprojectDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    """Time the scheduler and download stages of each request.
+
+    Queue wait runs from scheduling until a download slot starts the
+    transfer. Download time is split into "render" for browser backends and
+    "download" for plain HTTP. Responses served from the HTTP cache never
+    reach the download handler and are not timed.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
 
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(Metrics.from_crawler(crawler))
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.request_scheduled, signal=signals.request_scheduled)
         return s
 
+    def request_scheduled(self, request, spider):
+        _timings(request)["scheduled"] = time.time()
+
+    def process_response(self, request, response, spider):
+        # Set by FastPathDownloadHandler when a slot starts the transfer
+        started = request.meta.get("download_started")
+        if started is None:
+            return response
+
+        timings = _timings(request)
+        domain = urlparse_cached(request).hostname
+        if "scheduled" in timings:
+            waited = max(started - timings.pop("scheduled"), 0.0) * 1000
+            timings["stages"]["queue"] = timings["stages"].get("queue", 0) + waited
+            self.metrics.observe("queue", spider, domain, waited)
+
+        stage = "render" if is_rendered(request) else "download"
+        elapsed = _elapsed_ms(started)
+        timings["stages"][stage] = timings["stages"].get(stage, 0) + elapsed
+        self.metrics.observe(stage, spider, domain, elapsed)
+        self.metrics.observe("bytes", spider, domain, len(response.body))
+        return response
+
+    def spider_opened(self, spider):
+        spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class RenderProfileMiddleware:
+    """Apply the spider's RENDER_PROFILE to Playwright requests.
+
+    Requests are aborted by resource type and domain pattern, and JavaScript
+    can be turned off for pages that don't need it, either for the whole
+    profile ("javascript": False) or per request (meta "render_javascript").
+    """
+
+    def __init__(self, profile, stats):
+        self.block_resource_types = profile.get("block_resource_types", [])
+        self.block_domains = profile.get("block_domains", [])
+        self.javascript = profile.get("javascript", True)
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        profile = crawler.settings.getdict("RENDER_PROFILE")
+        if not profile:
+            raise NotConfigured
+        return cls(profile, crawler.stats)
+
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+        if not request.meta.get("playwright"):
+            return None
+
+        request.meta.setdefault("playwright_page_init_callback", self.init_page)
+        if not request.meta.get("render_javascript", self.javascript):
+            context = request.meta.get("playwright_context", "default")
+            request.meta["playwright_context"] = f"{context}-nojs"
+            request.meta["playwright_context_kwargs"] = {"java_script_enabled": False}
+        return None
+
+    async def init_page(self, page, request):
+        resource_filter = PageResourceFilter(
+            self.block_resource_types, self.block_domains, self.stats
+        )
+        await resource_filter.attach(page)
+
+
+class AdaptiveRenderMiddleware:
+    """Render requests marked with meta "render": "auto" as cheaply as possible.
+
+    The first request for a URL pattern is fetched over plain HTTP. If the
+    response lacks meta "render_selector" it is retried with the browser
+    backend (meta "render_backend", defaulting to RENDER_FALLBACK), and the
+    decision is remembered so later requests for that pattern skip straight
+    to the right backend. RENDER_MODE = "browser" always uses the backend.
+
+    Only 2xx HTML responses are judged; errors are left to the retry and
+    HttpError middlewares. Once plain HTTP has worked for a pattern, it takes
+    RENDER_ESCALATE_AFTER misses in a row, not one empty page, to switch.
+    """
+
+    def __init__(self, mode, fallback, escalate_after, stats):
+        self.mode = mode
+        self.fallback = fallback
+        self.escalate_after = escalate_after
+        self.stats = stats
+        self.decisions = {}
+        self.misses = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            settings.get("RENDER_MODE"),
+            settings.get("RENDER_FALLBACK"),
+            settings.getint("RENDER_ESCALATE_AFTER"),
+            crawler.stats,
+        )
+
+    def process_request(self, request, spider):
+        if request.meta.get("render") != "auto":
+            return None
+
+        if "render_attempt" not in request.meta:
+            backend = request.meta.get("render_backend", self.fallback)
+            if self.mode == "adaptive":
+                backend = self.decisions.get(url_pattern(request.url), "http")
+            request.meta["render_attempt"] = backend
+
+        RENDERERS[request.meta["render_attempt"]].apply(request, spider.settings)
         return None
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
+        if request.meta.get("render") != "auto" or request.meta.get("render_attempt") != "http":
+            return response
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
-        return response
+        if not 200 <= response.status < 300 or not isinstance(response, HtmlResponse):
+            return response
 
-    def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+        pattern = url_pattern(request.url)
+        if response.css(request.meta["render_selector"]):
+            self.decisions[pattern] = "http"
+            self.misses[pattern] = 0
+            self.stats.inc_value("render/http")
+            return response
+
+        if self.decisions.get(pattern) == "http":
+            self.misses[pattern] += 1
+            if self.misses[pattern] < self.escalate_after:
+                # Likely just an empty page, e.g. past the last results
+                self.stats.inc_value("render/http_miss")
+                return response
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+        backend = request.meta.get("render_backend", self.fallback)
+        logging.info(f"{pattern} needs {backend} rendering")
+        self.decisions[pattern] = backend
+        self.stats.inc_value(f"render/escalated/{backend}")
+
+        meta = dict(request.meta, render_attempt=backend)
+        return request.replace(meta=meta, dont_filter=True)
+
+
+class IrrelevantResponse(IgnoreRequest):
+    """An article response didn't mention the topic often enough."""
+
+
+class RelevanceFilterMiddleware:
+    """Drop article responses that are off topic before the spider parses them.
+
+    Responses for parse_article are scored against RELEVANCE_VOCABULARY and
+    need at least RELEVANCE_THRESHOLD matches, or the spider's entry in
+    RELEVANCE_THRESHOLDS. Listing code can pass the card text in meta
+    "relevance_text"; when that already scores, the body isn't scanned.
+    Off-topic URLs are recorded with the spider's ``reject``, if it has one,
+    so later runs with the same vocabulary and threshold skip them.
+    """
+
+    callbacks = ("parse_article",)
+
+    def __init__(self, vocabulary, threshold, site_thresholds, stats):
+        self.matcher = TopicMatcher(vocabulary)
+        self.digest = vocabulary_digest(vocabulary)
+        self.threshold = threshold
+        self.site_thresholds = site_thresholds
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        vocabulary = settings.getlist("RELEVANCE_VOCABULARY")
+        if not vocabulary:
+            raise NotConfigured
+        mw = cls(
+            vocabulary,
+            settings.getint("RELEVANCE_THRESHOLD"),
+            settings.getdict("RELEVANCE_THRESHOLDS"),
+            crawler.stats,
+        )
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        return mw
+
+    def _threshold(self, spider):
+        return self.site_thresholds.get(spider.name, self.threshold)
 
     def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+        scopes = getattr(spider, "rejection_scopes", None)
+        if scopes is not None and self._threshold(spider) > 0:
+            scopes["off_topic"] = f"{self._threshold(spider)}:{self.digest}"
+
+    def process_spider_input(self, response, spider):
+        callback = getattr(response.request.callback, "__name__", None)
+        threshold = self._threshold(spider)
+        if callback not in self.callbacks or threshold <= 0:
+            return None
+
+        card_text = response.meta.get("relevance_text")
+        if card_text and self.matcher.score(card_text, threshold) >= threshold:
+            self.stats.inc_value("relevance/hit/card", spider=spider)
+            return None
+
+        if self.matcher.score(response.body, threshold) >= threshold:
+            self.stats.inc_value("relevance/hit/body", spider=spider)
+            return None
+
+        self.stats.inc_value("relevance/miss", spider=spider)
+        if "off_topic" in getattr(spider, "rejection_scopes", {}):
+            spider.reject(response.url, "off_topic")
+        raise IrrelevantResponse(f"Off topic: {response.url}")
+
+    def process_spider_exception(self, response, exception, spider):
+        if isinstance(exception, IrrelevantResponse):
+            logging.debug(str(exception))
+            return []
+        return None
+
+
+class _SlotWindow:
+    """Observations of one download slot since its last adjustment."""
+
+    def __init__(self, kind, concurrency):
+        self.kind = kind
+        self.concurrency = float(concurrency)
+        self.baseline = None
+        self.reset()
+
+    def reset(self):
+        self.latencies = []
+        self.errors = 0
+        self.failures = 0
+        self.saturated = False
+
+
+class AdaptiveConcurrencyMiddleware:
+    """Tune download concurrency per domain and request type with AIMD.
+
+    Requests go to a "<domain>#browser" or "<domain>#plain" download slot,
+    starting at ADAPTIVE_CONCURRENCY_START for their type. Every
+    ADAPTIVE_CONCURRENCY_INTERVAL seconds each slot that saw traffic is
+    checked. Its concurrency is multiplied by ADAPTIVE_CONCURRENCY_BACKOFF
+    when its median latency exceeds ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE
+    times the best median seen, when more than ADAPTIVE_CONCURRENCY_ERROR_RATE
+    of its downloads were 429s, 5xxs or errors, or, for browser slots, when
+    the browsers use more than ADAPTIVE_CONCURRENCY_BROWSER_MEMORY_MB.
+    Otherwise a slot that had every transfer busy gets one more. Limits are
+    [min, max] per type in ADAPTIVE_CONCURRENCY_LIMITS.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_CONCURRENCY_ENABLED"):
+            raise NotConfigured
+        self.crawler = crawler
+        self.start = settings.getdict("ADAPTIVE_CONCURRENCY_START")
+        self.limits = settings.getdict("ADAPTIVE_CONCURRENCY_LIMITS")
+        self.interval = settings.getfloat("ADAPTIVE_CONCURRENCY_INTERVAL")
+        self.tolerance = settings.getfloat("ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE")
+        self.error_rate = settings.getfloat("ADAPTIVE_CONCURRENCY_ERROR_RATE")
+        self.backoff = settings.getfloat("ADAPTIVE_CONCURRENCY_BACKOFF")
+        self.memory_limit = settings.getint("ADAPTIVE_CONCURRENCY_BROWSER_MEMORY_MB") * 1024**2
+        self.windows = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mw = cls(crawler)
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(mw.response_downloaded, signal=signals.response_downloaded)
+        return mw
+
+    def spider_opened(self, spider):
+        self.adjuster = task.LoopingCall(self.adjust)
+        self.adjuster.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.adjuster.running:
+            self.adjuster.stop()
+
+    def process_request(self, request, spider):
+        slot = request.meta.get("download_slot")
+        if slot and "#" not in slot:
+            # Pinned to a slot by someone else
+            return None
+
+        kind = "browser" if is_rendered(request) else "plain"
+        key = f"{urlparse_cached(request).hostname}#{kind}"
+        request.meta["download_slot"] = key
+        if key not in self.windows:
+            self.windows[key] = _SlotWindow(kind, self.start[kind])
+            # Read by the downloader when it creates the slot
+            self._downloader.per_slot_settings[key] = {"concurrency": self.start[kind]}
+        return None
+
+    def process_exception(self, request, exception, spider):
+        window = self.windows.get(request.meta.get("download_slot"))
+        if window is not None:
+            window.failures += 1
+        return None
+
+    @property
+    def _downloader(self):
+        return self.crawler.engine.downloader
+
+    def response_downloaded(self, response, request, spider):
+        key = request.meta.get("download_slot")
+        window = self.windows.get(key)
+        started = request.meta.get("download_started")
+        if window is None or started is None:
+            return
+
+        window.latencies.append(time.time() - started)
+        if response.status == 429 or response.status >= 500:
+            window.errors += 1
+        slot = self._downloader.slots.get(key)
+        # This transfer still holds its place, so a full slot means no idle capacity
+        if slot is not None and len(slot.transferring) >= slot.concurrency:
+            window.saturated = True
+
+    def adjust(self):
+        memory = None
+        if any(w.kind == "browser" and w.latencies for w in self.windows.values()):
+            memory = browser_rss()
+
+        for key, window in self.windows.items():
+            downloads = len(window.latencies) + window.failures
+            if not downloads:
+                continue
+
+            reason = None
+            if window.latencies:
+                latency = statistics.median(window.latencies)
+                low = self.limits[window.kind][0]
+                if window.baseline is None or window.concurrency <= low:
+                    # Still slow with the fewest requests in flight means the
+                    # site got slower for good, so that is the new best
+                    window.baseline = latency
+                window.baseline = min(latency, window.baseline)
+                if latency > self.tolerance * window.baseline:
+                    reason = f"latency {latency * 1000:.0f}ms"
+            errors = (window.errors + window.failures) / downloads
+            if errors > self.error_rate:
+                reason = f"{errors:.0%} errors"
+            if window.kind == "browser" and memory and memory > self.memory_limit:
+                reason = f"browsers using {memory / 1024**2:.0f}MB"
+
+            low, high = self.limits[window.kind]
+            before = int(window.concurrency)
+            if reason:
+                window.concurrency = max(low, window.concurrency * self.backoff)
+            elif window.saturated:
+                window.concurrency = min(high, window.concurrency + 1)
+            window.reset()
+
+            concurrency = int(window.concurrency)
+            self.crawler.stats.set_value(f"adaptive_concurrency/{key}", concurrency)
+            if concurrency == before:
+                continue
+            logging.info(f"{key} concurrency {before} -> {concurrency}" + (f" ({reason})" if reason else ""))
+            self._downloader.per_slot_settings[key] = {"concurrency": concurrency}
+            slot = self._downloader.slots.get(key)
+            if slot is not None:
+                slot.concurrency = concurrency
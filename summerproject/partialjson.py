@@ -0,0 +1,124 @@
+"""Pull a few values out of a large JSON document without decoding all of it.
+
+The objects holding the requested values are found by searching the raw text
+for their keys, one level after another, and only those objects are handed to
+the C decoder. A key found by searching only counts if every bracket between it
+and its parent object closes again, so the same key nested elsewhere is
+skipped. Searching and bracket matching use C string methods, far cheaper than
+decoding the hundreds of KB of unrelated page state around the values. When a
+search comes up empty, the whole document is decoded instead.
+"""
+
+import json
+import re
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Everything but brackets that JSON allows outside strings
+NOT_BRACKETS = str.maketrans("", "", "0123456789+-.eE,:truefalsn \t\n\r")
+
+_decoder = json.JSONDecoder()
+
+
+def _ws(text, idx):
+    return WHITESPACE.match(text, idx).end()
+
+
+def _brackets(text):
+    """The brackets of a stretch of JSON that starts outside any string."""
+    # Escapes go first, so only the quotes delimiting strings are left
+    if "\\" in text:
+        text = text.replace("\\\\", "").replace('\\"', "")
+    return "".join(text.split('"')[::2]).translate(NOT_BRACKETS)
+
+
+def _unmatched(brackets):
+    """The brackets left over once every pair that closes in ``brackets`` is removed."""
+    while True:
+        reduced = brackets.replace("{}", "").replace("[]", "")
+        if reduced == brackets:
+            return brackets
+        brackets = reduced
+
+
+def _find_value(text, key, container):
+    """Index of the value of ``key`` in the object opening at ``container``, or -1.
+
+    A ``"key":`` found further on may belong to a nested object or to one
+    after the container, so the brackets between it and the container, less
+    those in strings, must all close again.
+    """
+    if not text.startswith("{", container):
+        return -1
+    needle = json.dumps(key)
+    scanned = idx = container + 1
+    unmatched = ""
+    while True:
+        idx = text.find(needle, idx)
+        if idx < 0:
+            return -1
+        after = _ws(text, idx + len(needle))
+        if not text.startswith(":", after):
+            # The same text as a string value, not a key
+            idx += len(needle)
+            continue
+
+        unmatched = _unmatched(unmatched + _brackets(text[scanned:idx]))
+        if not unmatched:
+            return _ws(text, after + 1)
+        if unmatched[0] in "}]":
+            # The container ended before this key
+            return -1
+        # A key of something nested in the container
+        scanned = idx = idx + len(needle)
+
+
+def _lookup(value, path):
+    for key in path:
+        value = value[int(key)] if isinstance(value, list) else value[key]
+    return value
+
+
+def _subtree(text, parent, start):
+    """Decode the value at the dotted ``parent`` path by searching for its keys,
+    returning (value, the part of ``parent`` still to look up in it)."""
+    idx = _ws(text, start)
+    for depth, key in enumerate(parent):
+        # Array elements have no key to search for
+        if key.isdigit():
+            return _decoder.raw_decode(text, idx)[0], parent[depth:]
+        idx = _find_value(text, key, idx)
+        if idx < 0:
+            raise KeyError(key)
+    return _decoder.raw_decode(text, idx)[0], ()
+
+
+def extract_paths(text, paths, start=0):
+    """Return {path: value} for the dotted ``paths`` found in the JSON at ``start``.
+
+    Paths that don't exist are left out. Array elements are addressed by
+    index, e.g. "author.0.name". Trailing content after the JSON value (such
+    as the rest of a script block) is ignored.
+    """
+    groups = {}
+    for path in paths:
+        keys = tuple(path.split("."))
+        groups.setdefault(keys[:-1], []).append((path, keys[-1]))
+
+    found = {}
+    document = None
+    for parent, members in groups.items():
+        try:
+            value, rest = _subtree(text, parent, start)
+            values = {path: _lookup(value, rest + (key,)) for path, key in members}
+        except (KeyError, IndexError, TypeError, ValueError):
+            # Not found by searching, or found in the wrong place
+            if document is None:
+                document = _decoder.raw_decode(text, _ws(text, start))[0]
+            values = {}
+            for path, key in members:
+                try:
+                    values[path] = _lookup(document, parent + (key,))
+                except (KeyError, IndexError, TypeError, ValueError):
+                    pass
+        found.update(values)
+    return found
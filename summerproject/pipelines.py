@@ -4,10 +4,309 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+import logging
+from functools import partial
+from pathlib import Path
+
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+from twisted.internet import defer, task, threads
+from twisted.python.threadpool import ThreadPool
+
+from summerproject.seen import content_fingerprint
+from summerproject.simhash import NearDuplicateIndex, simhash
+from summerproject.storage import ArticleStore
+
+# Sent by ArticleStoragePipeline before it writes a batch. Receivers return a
+# callable committing what they recorded so far, called once the batch is
+# stored, or None.
+storage_flushing = object()
+
+
+class SeenIndexPipeline:
+    """Record stored articles in the spider's seen index.
+
+    Articles whose content was already stored under another URL are dropped,
+    but their URL is still recorded so later runs don't fetch it again.
+    With STORAGE_PATH set, the index is committed along with the storage
+    batches, otherwise after every item.
+    """
+
+    def __init__(self, deferred):
+        self.deferred = deferred
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(bool(crawler.settings.get("STORAGE_PATH")))
+        crawler.signals.connect(pipeline.storage_flushing, signal=storage_flushing)
+        return pipeline
+
+    def storage_flushing(self, spider):
+        seen = getattr(spider, "seen", None)
+        if seen is not None and seen.pending:
+            return partial(seen.commit, seen.mark())
+        return None
+
+    def process_item(self, item, spider):
+        seen = getattr(spider, "seen", None)
+        if seen is None:
+            return item
+
+        adapter = ItemAdapter(item)
+        content = adapter.get("content")
+        # Empty bodies from failed extractions aren't duplicates of each other
+        fingerprint = content_fingerprint(content) if content and content.strip() else None
+        duplicate = fingerprint is not None and seen.has_fingerprint(fingerprint)
+        seen.add(adapter["url"], spider.name, fingerprint)
+        if not self.deferred:
+            seen.commit()
+
+        if duplicate:
+            raise DropItem(f"Content already stored: {adapter['url']}")
+        return item
+
+
+class NearDuplicatePipeline:
+    """Drop or tag articles whose content is a near-duplicate of one already
+    stored, e.g. the same story under another category or syndicated wire copy.
+
+    Runs after SeenIndexPipeline, so a duplicate's URL is already recorded and
+    won't be fetched again on the next crawl. Fingerprints are committed the
+    same way as the seen index.
+    """
+
+    def __init__(self, path, action, bands, max_distance, min_tokens, deferred, stats):
+        if action not in ("drop", "tag"):
+            raise ValueError(f"Unknown NEAR_DUPLICATE_ACTION: {action}")
+        self.path = path
+        self.action = action
+        self.bands = bands
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self.deferred = deferred
+        self.stats = stats
+        self.index = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get("NEAR_DUPLICATE_INDEX_PATH"):
+            raise NotConfigured
+        pipeline = cls(
+            settings.get("NEAR_DUPLICATE_INDEX_PATH"),
+            settings.get("NEAR_DUPLICATE_ACTION"),
+            settings.getint("NEAR_DUPLICATE_BANDS"),
+            settings.getint("NEAR_DUPLICATE_MAX_DISTANCE"),
+            settings.getint("NEAR_DUPLICATE_MIN_TOKENS"),
+            bool(settings.get("STORAGE_PATH")),
+            crawler.stats,
+        )
+        crawler.signals.connect(pipeline.storage_flushing, signal=storage_flushing)
+        # Closed after the storage pipeline has committed its last batch
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def storage_flushing(self):
+        if self.index is not None and self.index.pending:
+            return partial(self.index.commit, self.index.mark())
+        return None
+
+    def open_spider(self, spider):
+        self.index = NearDuplicateIndex(self.path, self.bands, self.max_distance)
+
+    def spider_closed(self, spider):
+        self.index.close()
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        fingerprint = simhash(adapter.get("content") or "", self.min_tokens)
+        if fingerprint is None:
+            self.stats.inc_value("near_duplicate/too_short", spider=spider)
+            return item
+        original = self.index.find(fingerprint)
+
+        if original is None:
+            self.index.add(adapter["url"], spider.name, fingerprint)
+            if not self.deferred:
+                self.index.commit()
+            return item
+
+        if self.action == "drop":
+            self.stats.inc_value("near_duplicate/dropped", spider=spider)
+            raise DropItem(f"Near-duplicate of {original}: {adapter['url']}")
+
+        self.stats.inc_value("near_duplicate/tagged", spider=spider)
+        adapter["near_duplicate_of"] = original
+        return item
+
+
+class EnrichmentPipeline:
+    """Collect article content in batches of ENRICHMENT_BATCH_SIZE and write
+    their hashed term counts and text statistics under
+    ENRICHMENT_DIR/<spider>, tokenizing each batch in one pass on a
+    dedicated worker thread. Items pass through unchanged.
+    """
+
+    def __init__(self, directory, batch_size, n_features, stats):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.n_features = n_features
+        self.stats = stats
+        self.buffer = []
+        self.pending = set()
 
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get("ENRICHMENT_DIR"):
+            raise NotConfigured
+        return cls(
+            settings.get("ENRICHMENT_DIR"),
+            settings.getint("ENRICHMENT_BATCH_SIZE"),
+            settings.getint("ENRICHMENT_FEATURES"),
+            crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        from twisted.internet import reactor
+
+        self.spider = spider
+        self.reactor = reactor
+        self.writer = None
+        # Batches are written one at a time, off the reactor's shared pool
+        self.worker = ThreadPool(minthreads=1, maxthreads=1, name="enrichment")
+        self.worker.start()
 
-class SummerprojectPipeline:
     def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        self.buffer.append((adapter["url"], adapter.get("content") or ""))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
         return item
+
+    def flush(self):
+        if not self.buffer:
+            return None
+        batch, self.buffer = self.buffer, []
+        urls, texts = zip(*batch)
+        if self.writer is None:
+            # numpy and scipy are slow to import, and incremental crawls
+            # often have nothing new to store
+            from summerproject.enrichment import FeatureWriter
+
+            self.writer = FeatureWriter(Path(self.directory) / self.spider.name, self.n_features)
+        d = threads.deferToThreadPool(
+            self.reactor, self.worker, self.writer.write, self.writer.reserve(), urls, texts
+        )
+        self.pending.add(d)
+        d.addCallback(lambda _: self._written(len(batch)))
+        d.addErrback(lambda failure: logging.error(f"Article enrichment failed: {failure.value}"))
+        d.addBoth(lambda _: self.pending.discard(d))
+        return d
+
+    def _written(self, articles):
+        self.stats.inc_value("enrichment/batches", spider=self.spider)
+        self.stats.inc_value("enrichment/articles", articles, spider=self.spider)
+
+    @defer.inlineCallbacks
+    def close_spider(self, spider):
+        self.flush()
+        yield defer.DeferredList(list(self.pending))
+        self.worker.stop()
+
+
+class ArticleStoragePipeline:
+    """Buffer items and write them to the article store in batches.
+
+    A batch is flushed once STORAGE_BATCH_SIZE items are buffered or every
+    STORAGE_FLUSH_INTERVAL seconds, on a dedicated writer thread so SQLite
+    never blocks the reactor. The seen and near-duplicate indexes are
+    committed after each batch is written; once a batch fails they no longer
+    are, so the next run fetches the lost articles again.
+    """
+
+    def __init__(self, path, batch_size, flush_interval, signals):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.signals = signals
+        self.buffer = []
+        self.pending = set()
+        self.failed = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get("STORAGE_PATH"):
+            raise NotConfigured
+        return cls(
+            settings.get("STORAGE_PATH"),
+            settings.getint("STORAGE_BATCH_SIZE"),
+            settings.getfloat("STORAGE_FLUSH_INTERVAL"),
+            crawler.signals,
+        )
+
+    def open_spider(self, spider):
+        from twisted.internet import reactor
+
+        self.spider = spider
+        self.reactor = reactor
+        self.writer = ThreadPool(minthreads=1, maxthreads=1, name="article-storage")
+        self.writer.start()
+        self.store = None
+        self._in_writer(self._open_store)
+
+        self.flusher = task.LoopingCall(self.flush)
+        self.flusher.start(self.flush_interval, now=False)
+
+    def _open_store(self):
+        self.store = ArticleStore(self.path)
+
+    def _in_writer(self, f, *args):
+        d = threads.deferToThreadPool(self.reactor, self.writer, f, *args)
+        self.pending.add(d)
+        d.addErrback(self._failed)
+        d.addBoth(lambda _: self.pending.discard(d))
+        return d
+
+    def _failed(self, failure):
+        self.failed = True
+        logging.error(f"Article storage failed: {failure.value}")
+
+    def process_item(self, item, spider):
+        self.buffer.append((spider.name, ItemAdapter(item).asdict()))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        return item
+
+    def flush(self):
+        commits = [
+            commit
+            for _, commit in self.signals.send_catch_log(storage_flushing, spider=self.spider)
+            if callable(commit)
+        ]
+        if not self.buffer and not commits:
+            return None
+        batch, self.buffer = self.buffer, []
+        d = self._in_writer(lambda: self.store.insert_many(batch))
+        d.addCallback(lambda _: self._commit(commits))
+        return d
+
+    def _commit(self, commits):
+        # Batches are written in order, so everything recorded before this
+        # one was taken is stored unless an earlier batch failed
+        if self.failed:
+            return
+        for commit in commits:
+            commit()
+
+    @defer.inlineCallbacks
+    def close_spider(self, spider):
+        if self.flusher.running:
+            self.flusher.stop()
+        self.flush()
+        yield defer.DeferredList(list(self.pending))
+        yield self._in_writer(lambda: self.store.close())
+        self.writer.stop()
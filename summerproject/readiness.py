@@ -0,0 +1,51 @@
+import logging
+
+import playwright
+
+# Identify a listing by how many cards it has and what the first one points to
+SNAPSHOT_JS = """
+selector => {
+    const nodes = document.querySelectorAll(selector);
+    if (!nodes.length) return [0, null];
+    const first = nodes[0];
+    return [
+        nodes.length,
+        first.getAttribute("href") || first.getAttribute("data-open-link") || first.textContent,
+    ];
+}
+"""
+
+CHANGED_JS = """
+([selector, count, first]) => {
+    const nodes = document.querySelectorAll(selector);
+    if (!nodes.length) return false;
+    const head = nodes[0];
+    const link = head.getAttribute("href") || head.getAttribute("data-open-link") || head.textContent;
+    return nodes.length !== count || link !== first;
+}
+"""
+
+
+async def listing_snapshot(page, selector):
+    return await page.evaluate(SNAPSHOT_JS, selector)
+
+
+async def wait_for_listing_change(page, selector, snapshot, timeout, network_idle=False):
+    """Wait until the cards matching ``selector`` differ from ``snapshot``.
+
+    The check re-runs on every DOM mutation, so it returns as soon as the new
+    cards are attached. Returns False if nothing changed within ``timeout`` ms.
+    """
+    try:
+        await page.wait_for_function(
+            CHANGED_JS,
+            arg=[selector, *snapshot],
+            polling="mutation",
+            timeout=timeout,
+        )
+        if network_idle:
+            await page.wait_for_load_state("networkidle", timeout=timeout)
+    except playwright.async_api.TimeoutError:
+        logging.info(f"Listing did not change within {timeout}ms")
+        return False
+    return True
@@ -0,0 +1,67 @@
+"""Score text against the topic vocabulary.
+
+The vocabulary is compiled into a single regular expression over bytes whose
+alternatives are factored through a trie, so terms sharing a prefix ("israel",
+"israeli") are walked once per position, like a multi-pattern automaton, and
+the raw response body can be scanned without decoding it.
+
+The pattern starts with a plain byte alternation, which lets the regex engine
+skip ahead to candidate first bytes; that is why the body is lowercased
+up front and the leading word boundary is checked by hand.
+"""
+
+import hashlib
+import re
+
+WORD_BYTES = frozenset(b"abcdefghijklmnopqrstuvwxyz0123456789_")
+
+
+def vocabulary_digest(terms):
+    """Short digest identifying a vocabulary, whatever the order of its terms."""
+    joined = "\n".join(sorted({term.lower() for term in terms}))
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()[:16]
+
+
+def _trie(terms):
+    root = {}
+    for term in terms:
+        node = root
+        for byte in term.lower().encode("utf-8"):
+            node = node.setdefault(byte, {})
+        node[None] = {}
+    return root
+
+
+def _pattern(node):
+    branches = [
+        # Spaces in a term match any run of whitespace, e.g. across a line break
+        (rb"\s+" if byte == 0x20 else re.escape(bytes([byte]))) + _pattern(child)
+        for byte, child in sorted((k, v) for k, v in node.items() if k is not None)
+    ]
+    if not branches:
+        return b""
+    pattern = branches[0] if len(branches) == 1 else b"(?:" + b"|".join(branches) + b")"
+    if None in node:
+        pattern = b"(?:" + pattern + b")?"
+    return pattern
+
+
+class TopicMatcher:
+    def __init__(self, vocabulary):
+        self.vocabulary = list(vocabulary)
+        self.pattern = re.compile(rb"(?:" + _pattern(_trie(self.vocabulary)) + rb")\b")
+
+    def score(self, data, limit=None):
+        """Count vocabulary matches in ``data``, stopping early at ``limit``."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        data = data.lower()
+        hits = 0
+        for match in self.pattern.finditer(data):
+            start = match.start()
+            if start and data[start - 1] in WORD_BYTES:
+                continue
+            hits += 1
+            if hits == limit:
+                break
+        return hits
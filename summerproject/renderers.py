@@ -0,0 +1,53 @@
+import re
+from urllib.parse import urlparse
+
+
+class HttpRenderer:
+    """Plain download, no JavaScript."""
+
+    name = "http"
+
+    def apply(self, request, settings):
+        request.meta.pop("playwright", None)
+        request.meta.pop("splash", None)
+
+
+class PlaywrightRenderer:
+    name = "playwright"
+
+    def apply(self, request, settings):
+        request.meta["playwright"] = True
+
+
+class SplashRenderer:
+    """Same meta a SplashRequest would carry, applied to an existing request."""
+
+    name = "splash"
+
+    def apply(self, request, settings):
+        splash = request.meta.setdefault("splash", {})
+        splash.setdefault("endpoint", "render.html")
+        splash.setdefault("magic_response", True)
+        splash.setdefault("http_status_from_error_code", True)
+        args = splash.setdefault("args", {})
+        args.setdefault("url", request.url)
+        args.setdefault("wait", settings.getfloat("SPLASH_WAIT", 2))
+        request.meta["ajax_crawlable"] = True
+
+
+RENDERERS = {
+    renderer.name: renderer
+    for renderer in (HttpRenderer(), PlaywrightRenderer(), SplashRenderer())
+}
+
+
+def url_pattern(url):
+    """Group URLs that share a page template, e.g. bbc.com/news/articles/*."""
+    parsed = urlparse(url)
+    segments = [s for s in parsed.path.split("/") if s]
+    # The last segment is the article slug or ID in every site we crawl, but
+    # a lone segment is the page itself, e.g. /search
+    if len(segments) > 1:
+        segments[-1] = "*"
+    path = re.sub(r"\d+", "#", "/".join(segments))
+    return f"{parsed.netloc}/{path}"
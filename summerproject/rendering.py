@@ -0,0 +1,82 @@
+import logging
+from fnmatch import fnmatch
+from urllib.parse import urlparse
+
+# Third parties that only serve ads, analytics and recommendation widgets
+AD_DOMAINS = [
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googletagmanager.com",
+    "google-analytics.com",
+    "amazon-adsystem.com",
+    "scorecardresearch.com",
+    "chartbeat.com",
+    "chartbeat.net",
+    "taboola.com",
+    "outbrain.com",
+    "*.adnxs.com",
+]
+
+# The spiders only read anchors and data attributes, so none of these matter
+LIGHTWEIGHT_PROFILE = {
+    "block_resource_types": ["image", "media", "font"],
+    "block_domains": AD_DOMAINS,
+    "javascript": True,
+}
+
+
+def domain_blocked(url, patterns):
+    host = urlparse(url).hostname or ""
+    return any(
+        host == pattern or host.endswith("." + pattern) or fnmatch(host, pattern)
+        for pattern in patterns
+    )
+
+
+class PageResourceFilter:
+    """Route handler that aborts unwanted requests made by one page."""
+
+    def __init__(self, block_resource_types, block_domains, stats):
+        self.block_resource_types = set(block_resource_types)
+        self.block_domains = list(block_domains)
+        self.stats = stats
+        self.blocked = 0
+        self.loaded = 0
+        self.bytes_loaded = 0
+
+    async def attach(self, page):
+        await page.route("**/*", self.handle_route)
+        page.on("response", self.record_response)
+        page.on("close", self.report)
+
+    async def handle_route(self, route, request):
+        reason = None
+        if request.resource_type in self.block_resource_types:
+            reason = request.resource_type
+        elif self.block_domains and domain_blocked(request.url, self.block_domains):
+            reason = "domain"
+
+        if reason is None:
+            # Let scrapy-playwright's own handler continue the request
+            await route.fallback()
+            return
+
+        self.blocked += 1
+        self.stats.inc_value(f"render_profile/blocked/{reason}")
+        await route.abort()
+
+    def record_response(self, response):
+        self.loaded += 1
+        self.stats.inc_value("render_profile/requests_loaded")
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.bytes_loaded += int(length)
+            self.stats.inc_value("render_profile/bytes_loaded", int(length))
+
+    def report(self, page):
+        # Aborted requests never report a size, so bytes are only known for
+        # what was loaded; compare against a run without a profile
+        logging.info(
+            f"Rendered {page.url}: blocked {self.blocked} requests,"
+            f" loaded {self.loaded} ({self.bytes_loaded} bytes)"
+        )
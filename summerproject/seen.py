@@ -0,0 +1,126 @@
+import hashlib
+import sqlite3
+import time
+
+
+def content_fingerprint(content):
+    # Normalise whitespace and case so cosmetic re-renders hash the same
+    normalised = " ".join(content.lower().split())
+    return hashlib.sha1(normalised.encode("utf-8")).hexdigest()
+
+
+class SeenIndex:
+    """On-disk index of article URLs and content fingerprints already stored.
+
+    Backed by SQLite so lookups stay exact and cheap across runs without
+    holding the whole archive in memory. Added rows are only visible to this
+    index until they are committed; ArticleStoragePipeline commits them once
+    the articles they stand for are stored, so a crash doesn't leave URLs
+    marked as seen that never made it to the store. Rows not committed by
+    close are dropped.
+
+    URLs the crawl rejected, off topic or outside its date window, are kept
+    in a separate ``rejections`` table, committed at once, along with the
+    scope of the verdict (the vocabulary and threshold, or the window). They
+    are only skipped again by crawls with the same scope for that reason.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " url TEXT PRIMARY KEY,"
+            " site TEXT,"
+            " fingerprint TEXT,"
+            " seen_at REAL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS seen_fingerprint ON seen (fingerprint)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS rejections ("
+            " url TEXT,"
+            " site TEXT,"
+            " reason TEXT,"
+            " scope TEXT,"
+            " rejected_at REAL,"
+            " PRIMARY KEY (url, reason))"
+        )
+        self.connection.commit()
+        # Rows added but not committed, numbered from ``committed``
+        self.pending = []
+        self.committed = 0
+        self.pending_urls = set()
+        self.pending_fingerprints = set()
+
+    @classmethod
+    def from_settings(cls, settings):
+        path = settings.get("SEEN_INDEX_PATH")
+        if not path:
+            return None
+        return cls(path)
+
+    def __contains__(self, url):
+        if url in self.pending_urls:
+            return True
+        row = self.connection.execute(
+            "SELECT 1 FROM seen WHERE url = ?", (url,)
+        ).fetchone()
+        return row is not None
+
+    def rejected(self, url, scopes):
+        """Whether ``url`` was rejected for a reason in ``scopes``, a dict of
+        reason -> scope, under the same scope."""
+        return any(
+            scopes.get(reason) == scope
+            for reason, scope in self.connection.execute(
+                "SELECT reason, scope FROM rejections WHERE url = ?", (url,)
+            )
+        )
+
+    def has_fingerprint(self, fingerprint):
+        if fingerprint in self.pending_fingerprints:
+            return True
+        row = self.connection.execute(
+            "SELECT 1 FROM seen WHERE fingerprint = ? LIMIT 1", (fingerprint,)
+        ).fetchone()
+        return row is not None
+
+    def add(self, url, site, fingerprint=None):
+        self.pending.append((url, site, fingerprint, time.time()))
+        self.pending_urls.add(url)
+        if fingerprint is not None:
+            self.pending_fingerprints.add(fingerprint)
+
+    def reject(self, url, site, reason, scope):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO rejections (url, site, reason, scope, rejected_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (url, site, reason, scope, time.time()),
+        )
+        self.connection.commit()
+
+    def mark(self):
+        """Position after the rows added so far, to pass to commit later."""
+        return self.committed + len(self.pending)
+
+    def commit(self, upto=None):
+        """Write the rows added before ``upto`` (a mark), or all of them."""
+        count = len(self.pending) if upto is None else upto - self.committed
+        if count <= 0:
+            return
+        rows, self.pending = self.pending[:count], self.pending[count:]
+        self.committed += count
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO seen (url, site, fingerprint, seen_at)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        self.pending_urls = {row[0] for row in self.pending}
+        self.pending_fingerprints = {row[2] for row in self.pending if row[2] is not None}
+
+    def close(self):
+        self.connection.close()
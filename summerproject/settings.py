@@ -2,14 +2,23 @@ BOT_NAME = "summerproject"
 
 SPIDER_MODULES = ["summerproject.spiders"]
 NEWSPIDER_MODULE = "summerproject.spiders"
+COMMANDS_MODULE = "summerproject.commands"
+# Lists spiders by reading their source and imports only the one that runs
+SPIDER_LOADER_CLASS = "summerproject.spiderloader.LazySpiderLoader"
 
 
 # settings.py
 DOWNLOAD_HANDLERS = {
-    "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
-    "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
+    "http": "summerproject.handlers.FastPathDownloadHandler",
+    "https": "summerproject.handlers.FastPathDownloadHandler",
 }
 
+# Requests without "playwright" meta skip the browser handler entirely.
+# Keep-alive connections per host for plain requests (0 = CONCURRENT_REQUESTS_PER_DOMAIN)
+FAST_PATH_CONNECTIONS_PER_HOST = 0
+# Multiplex plain https requests over one HTTP/2 connection per host (needs h2)
+FAST_PATH_HTTP2 = False
+
 # settings.py
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 
@@ -21,7 +30,8 @@ USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTM
 ROBOTSTXT_OBEY = False
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
+# Kept high so the per-slot limits below decide
+CONCURRENT_REQUESTS = 64
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
@@ -45,15 +55,19 @@ ROBOTSTXT_OBEY = False
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "bbcnews.middlewares.BbcnewsSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    "summerproject.middlewares.RelevanceFilterMiddleware": 543,
+    "summerproject.middlewares.SummerprojectSpiderMiddleware": 950,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "bbcnews.middlewares.BbcnewsDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "summerproject.middlewares.AdaptiveRenderMiddleware": 540,
+    "summerproject.middlewares.RenderProfileMiddleware": 543,
+    "summerproject.middlewares.AdaptiveConcurrencyMiddleware": 545,
+    "summerproject.middlewares.SummerprojectDownloaderMiddleware": 950,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -63,9 +77,12 @@ ROBOTSTXT_OBEY = False
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "bbcnews.pipelines.BbcnewsPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "summerproject.pipelines.SeenIndexPipeline": 300,
+    "summerproject.pipelines.NearDuplicatePipeline": 350,
+    "summerproject.pipelines.EnrichmentPipeline": 700,
+    "summerproject.pipelines.ArticleStoragePipeline": 800,
+}
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -82,13 +99,156 @@ ROBOTSTXT_OBEY = False
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
+# Every response is kept and stale ones are revalidated with ETag /
+# If-Modified-Since. "scrapy replay <spider>" re-runs a crawl from the cache
+# alone, which needs the listing pages of a sharded crawl (LISTING_SHARDS > 1
+# or -a shards=N): click-through listings are never cached.
+# HTTPCACHE_MAX_BYTES bounds each spider's cache file.
+HTTPCACHE_ENABLED = True
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_DIR = "httpcache"
 #HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+HTTPCACHE_STORAGE = "summerproject.httpcache.SqliteCacheStorage"
+HTTPCACHE_POLICY = "summerproject.httpcache.ReplayPolicy"
+HTTPCACHE_ALWAYS_STORE = True
+HTTPCACHE_MAX_BYTES = 2 * 1024**3
+HTTPCACHE_OFFLINE = False
 
 # Set settings whose default value is deprecated to a future-proof value
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
+
+# Persistent index of stored articles, consulted to skip known URLs on re-crawls
+SEEN_INDEX_PATH = "seen.sqlite3"
+
+# Listing pagination waits for the cards to change rather than sleeping.
+# Set to "sleep" to restore the old fixed waits (e.g. for benchmarking).
+LISTING_READINESS = "event"
+LISTING_READY_TIMEOUT = 30 * 1000
+LISTING_READY_NETWORK_IDLE = False
+# Stop paginating after this many listing pages (0 = no limit)
+LISTING_MAX_PAGES = 0
+# Walk search results in this many concurrent shards, each in its own browser
+# context, instead of clicking "Next" in a single page. Overridable per run
+# with -a shards=N.
+LISTING_SHARDS = 1
+# The click-through listing loops save their position, harvested links and
+# article count here after every page, and a restarted crawl resumes from it.
+# Kept under JOBDIR instead when one is set; empty turns checkpoints off.
+# Checkpoints older than LISTING_CHECKPOINT_MAX_AGE seconds are discarded and
+# the listing starts over; 0 resumes them however old.
+LISTING_CHECKPOINT_DIR = "checkpoints"
+LISTING_CHECKPOINT_MAX_AGE = 24 * 3600
+
+# Per-spider Playwright rendering profile (see summerproject.rendering), set
+# through custom_settings. Empty disables resource blocking.
+RENDER_PROFILE = {}
+
+# Requests with meta "render": "auto" try plain HTTP first and only escalate to
+# RENDER_FALLBACK ("playwright" or "splash") when their selector is missing.
+# "browser" skips the plain HTTP attempt. A pattern that plain HTTP already
+# worked for only escalates after RENDER_ESCALATE_AFTER misses in a row.
+RENDER_MODE = "adaptive"
+RENDER_FALLBACK = "playwright"
+RENDER_ESCALATE_AFTER = 3
+
+# Run parse_article extraction in this many worker processes (0 = inline on
+# the reactor thread), with at most EXTRACTION_MAX_PENDING in flight
+EXTRACTION_PROCESSES = 0
+EXTRACTION_MAX_PENDING = 32
+
+# Saved article HTML, one directory per site, used by "scrapy benchextract"
+BENCH_CORPUS_DIR = "benchmarks/corpus"
+
+# Articles are stored in SQLite, flushed in batches of STORAGE_BATCH_SIZE items
+# or every STORAGE_FLUSH_INTERVAL seconds, whichever comes first
+STORAGE_PATH = "articles.sqlite3"
+STORAGE_BATCH_SIZE = 500
+STORAGE_FLUSH_INTERVAL = 10.0
+
+# Hashed term counts and text statistics of stored articles, written as
+# memory-mappable .npy batches of ENRICHMENT_BATCH_SIZE articles under
+# ENRICHMENT_DIR/<spider>/. Load them with summerproject.enrichment.load_batches.
+# ENRICHMENT_FEATURES is the number of hash columns, shared by every batch.
+ENRICHMENT_DIR = "features"
+ENRICHMENT_BATCH_SIZE = 500
+ENRICHMENT_FEATURES = 2**20
+
+# SimHash index of stored article content. Articles within
+# NEAR_DUPLICATE_MAX_DISTANCE bits of a stored one are dropped, or with
+# NEAR_DUPLICATE_ACTION = "tag" kept with a near_duplicate_of field.
+# MAX_DISTANCE must stay below BANDS for the banded lookup to find every match.
+# Articles with fewer than NEAR_DUPLICATE_MIN_TOKENS words (e.g. an empty body
+# from a failed extraction) aren't fingerprinted, as they would all match.
+NEAR_DUPLICATE_INDEX_PATH = "seen.sqlite3"
+NEAR_DUPLICATE_ACTION = "drop"
+NEAR_DUPLICATE_BANDS = 4
+NEAR_DUPLICATE_MAX_DISTANCE = 3
+NEAR_DUPLICATE_MIN_TOKENS = 50
+
+# Article responses must match the topic vocabulary at least RELEVANCE_THRESHOLD
+# times before they are parsed. RELEVANCE_THRESHOLDS overrides it per spider
+# name, e.g. {"cnn": 3}; 0 turns the filter off for that spider.
+RELEVANCE_VOCABULARY = [
+    "israel",
+    "israeli",
+    "gaza",
+    "hamas",
+    "west bank",
+    "palestine",
+    "palestinian",
+    "netanyahu",
+    "hezbollah",
+    "idf",
+]
+RELEVANCE_THRESHOLD = 1
+RELEVANCE_THRESHOLDS = {}
+
+# Per-stage timing histograms (queue, download, render, bytes, callbacks,
+# pipeline) by spider and domain, rewritten to METRICS_DIR/<spider>.json every
+# METRICS_INTERVAL seconds. The METRICS_SLOWEST slowest URLs are logged at close.
+METRICS_DIR = "metrics"
+METRICS_INTERVAL = 60.0
+METRICS_SLOWEST = 20
+
+# Concurrency per "<domain>#browser" / "<domain>#plain" download slot is tuned
+# with AIMD: backed off on rising latency, 429/5xx or browser memory, grown by
+# one while the slot stays busy. Limits are [min, max] per request type.
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_CONCURRENCY_START = {"plain": 4, "browser": 2}
+ADAPTIVE_CONCURRENCY_LIMITS = {"plain": [1, 32], "browser": [1, 8]}
+ADAPTIVE_CONCURRENCY_INTERVAL = 5.0
+ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE = 2.0
+ADAPTIVE_CONCURRENCY_ERROR_RATE = 0.05
+ADAPTIVE_CONCURRENCY_BACKOFF = 0.5
+ADAPTIVE_CONCURRENCY_BROWSER_MEMORY_MB = 4096
+
+# Shared frontier for splitting one spider's crawl across several workers. Run
+# the same spider on each worker with
+#   -s SCHEDULER=summerproject.frontier.FrontierScheduler
+#   -s FRONTIER_URL=redis://host:6379/0
+# Requests are leased for FRONTIER_LEASE_SECONDS and requeued if their worker
+# stops renewing them, at most FRONTIER_MAX_LEASES times. A worker holds at most
+# FRONTIER_PREFETCH leases at once, so keep it a little above the download
+# concurrency it reaches. With FRONTIER_PERSIST the queue and seen set are kept
+# after a finished crawl.
+FRONTIER_URL = ""
+FRONTIER_KEY_PREFIX = "summerproject"
+FRONTIER_LEASE_SECONDS = 300
+FRONTIER_MAX_LEASES = 3
+FRONTIER_PREFETCH = 32
+FRONTIER_PERSIST = False
+
+# Listing pages are checked against these budgets after every result page.
+# Over budget, the aljazeera listing empties the cards it has harvested, and
+# the abc and cnn listings reopen at the next page in a fresh browser context.
+# Peak page heap, DOM nodes and browser RSS are kept in the memory/ stats.
+MEMORY_GOVERNOR_ENABLED = True
+MEMORY_PAGE_HEAP_MB = 512
+MEMORY_PAGE_NODES = 200_000
+MEMORY_BROWSER_RSS_MB = 3072
+# Browser RSS counts every browser of the process, other spiders' under
+# crawlall too, so a fresh context may not bring it down. After reporting it,
+# ignore it for this many checks, doubling while it stays over budget.
+MEMORY_BROWSER_RSS_COOLDOWN = 10
@@ -0,0 +1,138 @@
+import hashlib
+import re
+import sqlite3
+from collections import Counter
+
+TOKEN = re.compile(r"\w+")
+
+BITS = 64
+LANE = 24
+LANE_MASK = (1 << LANE) - 1
+
+# SPREAD[position][byte] places each bit of a digest byte in its own LANE-bit
+# counter, so adding up spread digests counts all 64 fingerprint bits at once
+SPREAD = [
+    [
+        sum(((byte >> bit) & 1) << (LANE * (position * 8 + bit)) for bit in range(8))
+        for byte in range(256)
+    ]
+    for position in range(BITS // 8)
+]
+
+
+# Spread digests of tokens seen so far; news vocabulary repeats heavily
+_token_cache = {}
+TOKEN_CACHE_SIZE = 200_000
+
+
+def _spread(token):
+    spread = _token_cache.get(token)
+    if spread is None:
+        d = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        spread = sum(SPREAD[position][byte] for position, byte in enumerate(d))
+        if len(_token_cache) >= TOKEN_CACHE_SIZE:
+            _token_cache.clear()
+        _token_cache[token] = spread
+    return spread
+
+
+def simhash(text, min_tokens=0):
+    """64-bit SimHash of ``text``, or None if it has fewer than ``min_tokens`` words.
+
+    Words are the features, weighted by roughly 1 + log2 of their count so
+    that common words don't outvote the rest of the article.
+    """
+    tokens = TOKEN.findall(text.lower())
+    if not tokens or len(tokens) < min_tokens:
+        return None
+    totals = 0
+    weights = 0
+    for token, count in Counter(tokens).items():
+        weight = count.bit_length()
+        totals += weight * _spread(token)
+        weights += weight
+
+    half = weights / 2
+    fingerprint = 0
+    for bit in range(BITS):
+        if (totals >> (LANE * bit)) & LANE_MASK > half:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def _signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class NearDuplicateIndex:
+    """Persistent SimHash index for finding near-duplicate articles.
+
+    Fingerprints are split into ``bands`` equal bit bands, each indexed. Two
+    fingerprints within ``max_distance`` bits of each other must agree on at
+    least one band when max_distance < bands, so only those candidates need
+    comparing. Like SeenIndex, added fingerprints are held back until
+    committed.
+    """
+
+    def __init__(self, path, bands=4, max_distance=3):
+        self.bands = bands
+        self.band_bits = BITS // bands
+        self.max_distance = max_distance
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(f"band{i} INTEGER" for i in range(bands))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS simhashes ("
+            f" url TEXT PRIMARY KEY, site TEXT, fingerprint INTEGER, {columns})"
+        )
+        for i in range(bands):
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS simhashes_band{i} ON simhashes (band{i})"
+            )
+        self.connection.commit()
+        # Rows added but not committed, numbered from ``committed``
+        self.pending = []
+        self.committed = 0
+        self.candidates_query = "SELECT url, fingerprint FROM simhashes WHERE " + " OR ".join(
+            f"band{i} = ?" for i in range(bands)
+        )
+
+    def _bands(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def find(self, fingerprint):
+        """Return the URL of a stored near-duplicate, or None."""
+        for url, _, other, *_ in self.pending:
+            if ((other & ((1 << 64) - 1)) ^ fingerprint).bit_count() <= self.max_distance:
+                return url
+        for url, other in self.connection.execute(
+            self.candidates_query, self._bands(fingerprint)
+        ):
+            if ((other & ((1 << 64) - 1)) ^ fingerprint).bit_count() <= self.max_distance:
+                return url
+        return None
+
+    def add(self, url, site, fingerprint):
+        self.pending.append((url, site, _signed(fingerprint), *self._bands(fingerprint)))
+
+    def mark(self):
+        """Position after the fingerprints added so far, to pass to commit later."""
+        return self.committed + len(self.pending)
+
+    def commit(self, upto=None):
+        """Write the fingerprints added before ``upto`` (a mark), or all of them."""
+        count = len(self.pending) if upto is None else upto - self.committed
+        if count <= 0:
+            return
+        rows, self.pending = self.pending[:count], self.pending[count:]
+        self.committed += count
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO simhashes VALUES (?, ?, ?, {', '.join('?' * self.bands)})",
+                rows,
+            )
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,105 @@
+"""Spider loader that finds spiders without importing their modules.
+
+Scrapy's SpiderLoader imports every module under SPIDER_MODULES to list the
+spiders, so every command and every crawl pays for the imports of every
+spider. This one reads the modules' source instead, indexing the top-level
+classes that set ``name`` to a string literal, and only imports a module when
+one of its spiders is loaded. Modules that set a spider name any other way
+are imported up front, as Scrapy would.
+"""
+
+import ast
+import importlib
+import importlib.util
+import pkgutil
+import traceback
+import warnings
+
+from scrapy.spiderloader import SpiderLoader
+
+# Marks a class whose name is only known once its module runs
+COMPUTED = object()
+
+
+def _module_sources(spec):
+    """Yield (module name, source path) for a module and, for a package, every
+    module below it, found through the import system's finders."""
+    if spec.origin and spec.origin.endswith(".py"):
+        yield spec.name, spec.origin
+    for info in pkgutil.iter_modules(spec.submodule_search_locations or []):
+        child = info.module_finder.find_spec(f"{spec.name}.{info.name}")
+        if child is not None:
+            yield from _module_sources(child)
+
+
+def _spider_name(node):
+    """The ``name`` a class body sets, COMPUTED if it isn't a literal, or None."""
+    name = None
+    for statement in node.body:
+        if isinstance(statement, ast.Assign):
+            targets, value = statement.targets, statement.value
+        elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+            targets, value = [statement.target], statement.value
+        else:
+            continue
+        if any(isinstance(t, ast.Name) and t.id == "name" for t in targets):
+            literal = isinstance(value, ast.Constant) and isinstance(value.value, str)
+            name = value.value if literal else COMPUTED
+    return name
+
+
+class LazySpiderLoader(SpiderLoader):
+    def _load_all_spiders(self):
+        # spider name -> (module name, class name), for spiders not imported yet
+        self._index = {}
+        for name in self.spider_modules:
+            try:
+                spec = importlib.util.find_spec(name)
+                if spec is None:
+                    raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+                for module, path in _module_sources(spec):
+                    self._index_module(module, path)
+            except (ImportError, SyntaxError):
+                if self.warn_only:
+                    warnings.warn(
+                        f"\n{traceback.format_exc()}Could not load spiders "
+                        f"from module '{name}'. "
+                        "See above traceback for details.",
+                        category=RuntimeWarning,
+                    )
+                else:
+                    raise
+        self._check_name_duplicates()
+
+    def _index_module(self, module, path):
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), path)
+        found = []
+        for node in tree.body:
+            # A spider subclasses something, at least scrapy.Spider
+            if isinstance(node, ast.ClassDef) and node.bases:
+                name = _spider_name(node)
+                if name is COMPUTED:
+                    self._load_spiders(importlib.import_module(module))
+                    return
+                if name:
+                    found.append((name, node.name))
+
+        for name, class_name in found:
+            self._found[name].append((module, class_name))
+            self._index[name] = (module, class_name)
+
+    def load(self, spider_name):
+        if spider_name not in self._spiders and spider_name in self._index:
+            module, class_name = self._index[spider_name]
+            self._spiders[spider_name] = getattr(importlib.import_module(module), class_name)
+        return super().load(spider_name)
+
+    def find_by_request(self, request):
+        # Matching needs each spider's allowed_domains, so import them all
+        for name in self._index:
+            self.load(name)
+        return super().find_by_request(request)
+
+    def list(self):
+        return list(dict.fromkeys([*self._index, *self._spiders]))
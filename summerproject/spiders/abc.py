@@ -1,54 +1,73 @@
 import scrapy
 import logging
-from json import JSONDecoder
 import playwright
 
+from summerproject.extractors import extract_abc
+from summerproject.rendering import LIGHTWEIGHT_PROFILE
+from summerproject.dates import card_date
+from summerproject.spiders.base import NewsSpider
 
-class AbcSpider(scrapy.Spider):
+HEADLINE_SELECTOR = ".ContentRoll__Headline a"
+DATE_SELECTOR = ".ContentRoll__Date"
+
+# Returns [href, title, date text] for every result headline
+CARDS_JS = """
+([headline, published]) => [...document.querySelectorAll(headline)].map(link => {
+    const item = link.closest(".ContentRoll__Item");
+    const date = item && item.querySelector(published);
+    return [link.getAttribute("href"), link.textContent, date ? date.textContent.trim() : null];
+})
+"""
+
+
+class AbcSpider(NewsSpider):
     name = "abc"
     start_urls = [
         "https://abcnews.go.com/search?searchtext=israel%20gaza%20hamas%20palestine&type=Story&sort=date"
     ]
+    extractor = staticmethod(extract_abc)
     custom_settings = {
         "PLAYWRIGHT_LAUNCH_OPTIONS": {
             "headless": True,
         },
         "DUPEFILTER_DEBUG": True,
+        "RENDER_PROFILE": LIGHTWEIGHT_PROFILE,
     }
     max_articles = 50
     article_count = 0
+    listing_selector = HEADLINE_SELECTOR
 
-    def start_requests(self):
-        for url in self.start_urls:
-            yield scrapy.Request(
-                url,
-                meta={
-                    "playwright": True,
-                    "playwright_include_page": True,
-                },
-                errback=self.errback_close_page,
-            )
+    def listing_url(self, page_number):
+        return f"{self.start_urls[0]}&page={page_number}"
+
+    def listing_cards(self, response):
+        cards = []
+        for item in response.css(".ContentRoll__Item"):
+            link = item.css(f"{HEADLINE_SELECTOR}::attr(href)").get()
+            if link and response.urljoin(link).startswith(f"{self.site_root}/"):
+                cards.append((link, item.css(f"{DATE_SELECTOR}::text").get()))
+        return cards
 
     async def parse(self, response):
         page = response.meta["playwright_page"]
+        page_number = response.meta.get("listing_page", 1)
         # Filter out when ABC repeats the same story in different categories
         last_title = None
 
         while True:
             await page.locator(".ContentRoll").wait_for()
-            articles = (
-                await page.locator(".ContentRoll__Headline").get_by_role("link").all()
-            )
+            cards = await page.evaluate(CARDS_JS, [HEADLINE_SELECTOR, DATE_SELECTOR])
 
-            logging.info(f"Found {len(articles)} links")
+            logging.info(f"Found {len(cards)} links")
+            new_links = 0
+            dates = []
 
-            for article in articles:
-                link = response.urljoin(await article.get_attribute("href"))
-                title = await article.text_content()
+            for link, title, published in cards:
+                link = response.urljoin(link)
 
                 logging.info(f"Operating on article: {link}")
 
-                if not link.startswith("https://abcnews.go.com/"):
+                if not link.startswith(f"{self.site_root}/"):
                     logging.info("Skipping link that leaves site")
                     continue
 
@@ -57,62 +76,71 @@ class AbcSpider(scrapy.Spider):
                     continue
                 last_title = title
 
+                published = card_date(link, published)
+                dates.append(published)
+                if self.skip_card(published):
+                    continue
+
+                if self.already_harvested(link):
+                    # Yielded before a restart, or again after the results shifted
+                    new_links += 1
+                    continue
+
+                if self.is_known(link):
+                    logging.info("Skipping already stored article")
+                    continue
+                new_links += 1
+
                 yield scrapy.Request(
                     link,
                     self.parse_article,
+                    meta={"relevance_text": title},
                 )
+                self.record_link(link)
 
                 self.article_count += 1
 
-                if self.article_count >= self.max_articles:
+                if self.reached_max_articles():
                     logging.info(f"Reached max articles limit: {self.max_articles}")
-                    await page.close()
+                    await self.end_listing(page)
                     return
 
+            self.checkpoint_page()
+
+            if self.listing_past_window(dates):
+                logging.info("Listing is past the date window, stopping")
+                await self.end_listing(page)
+                return
+
+            if not new_links and not self.listing_ahead_of_window(dates):
+                logging.info("Listing page only has known articles, stopping")
+                await self.end_listing(page)
+                return
+
+            if not self.listing_page_done():
+                logging.info("Reached listing page limit")
+                await self.end_listing(page)
+                return
+
+            if await self.memory_pressure(page):
+                yield await self.recycle_listing(page, page_number + 1)
+                return
+
+            snapshot = await self.snapshot_listing(page, HEADLINE_SELECTOR)
             try:
                 await page.locator(
                     "//a[starts-with(@href,'/search') and .='Next']"
                 ).click()
             except playwright.async_api.TimeoutError:
                 logging.info("No more pages, closing")
-                await page.close()
+                await self.end_listing(page)
+                return
+            page_number += 1
+
+            if self.settings.get("LISTING_READINESS") == "sleep":
+                # Ensure the next page starts loading before trying to pull more links
+                await page.locator("//h3[.='Loading...']").wait_for()
+            elif not await self.wait_for_listing(page, HEADLINE_SELECTOR, snapshot, 0):
+                # Harvesting the same cards again would never end
+                await self.stall_listing(page)
                 return
-
-            # Ensure the next page starts loading before trying to pull more links
-            await page.locator("//h3[.='Loading...']").wait_for()
-
-    async def errback_close_page(self, failure):
-        page = failure.request.meta["playwright_page"]
-        await page.close()
-
-    def parse_article(self, response):
-        logging.info(f"Scraping article: {response.url}")
-
-        title = response.xpath("//h1/span/text()").get().strip()
-        content = " ".join(
-            "".join(p.xpath(".//text()").getall()).strip()
-            for p in response.xpath("//div[@data-testid='prism-article-body']/p")
-        )
-
-        logging.info(f"Found relevant article: {title}")
-
-        # Locate the script block that sets metadata
-        data_identifier = "window['__abcnews__']="
-        script_block = response.xpath(
-            f'/html/body/script[contains(.,"{data_identifier}")]/text()'
-        ).get()
-
-        # Use raw_decode to discard the remaining JS after the metadata
-        page_data = JSONDecoder().raw_decode(
-            script_block.partition(data_identifier)[2]
-        )[0]
-        story_data = page_data["page"]["content"]["story"]["story"]
-
-        yield {
-            "title": title,
-            "content": content,
-            "publish_date": story_data["publishedDate"],
-            "url": response.url,
-            "author": story_data["authorsStr"].strip().replace(", ", ","),
-            "word_count": story_data["wordCount"],
-        }
@@ -1,104 +1,166 @@
 import scrapy
 import logging
 import itertools
-import json
 import playwright
 
+from summerproject.extractors import extract_aljazeera
+from summerproject.rendering import LIGHTWEIGHT_PROFILE
+from summerproject.dates import card_date
+from summerproject.spiders.base import NewsSpider
+
+LINK_SELECTOR = "a.u-clickable-card__link"
+CARD_SELECTOR = f"article {LINK_SELECTOR}"
+
+# Returns [href, date text, headline] for every card not harvested yet and marks it, so
+# each batch only pays for the cards the last "show more" appended
+HARVEST_JS = """
+selector => {
+    const cards = [];
+    for (const card of document.querySelectorAll("article:not([data-harvested])")) {
+        card.setAttribute("data-harvested", "");
+        const link = card.querySelector(selector);
+        const published = card.querySelector(".date-simple span[aria-hidden='true']");
+        cards.push([
+            link ? link.getAttribute("href") : null,
+            published ? published.textContent.trim() : null,
+            link ? link.textContent.trim() : null,
+        ]);
+    }
+    return cards;
+}
+"""
+
+
+# Empties the cards already harvested, keeping the marked elements so the
+# harvest doesn't see them again, and returns how many it emptied
+PRUNE_JS = """
+() => {
+    const cards = document.querySelectorAll("article[data-harvested]:not(:empty)");
+    for (const card of cards) {
+        card.replaceChildren();
+    }
+    return cards.length;
+}
+"""
 
-class AljazeeraSpider(scrapy.Spider):
+
+class AljazeeraSpider(NewsSpider):
     name = "aljazeera"
     start_urls = ["https://www.aljazeera.com/tag/israel-palestine-conflict/"]
+    extractor = staticmethod(extract_aljazeera)
     custom_settings = {
         "PLAYWRIGHT_LAUNCH_OPTIONS": {
             "headless": True,
         },
         "PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT": 10 * 60 * 1000,  # 10 minutes
         "DUPEFILTER_DEBUG": True,
+        "RENDER_PROFILE": LIGHTWEIGHT_PROFILE,
     }
     pages = None
-
-    def start_requests(self):
-        for url in self.start_urls:
-            yield scrapy.Request(
-                url,
-                meta={
-                    "playwright": True,
-                    "playwright_include_page": True,
-                },
-                errback=self.errback_close_page,
-            )
+    # The listing goes back years, so by default stop at the war's start
+    since = "2023-10-06"
 
     async def parse(self, response):
         page = response.meta["playwright_page"]
-        await page.wait_for_timeout(5000)
+        if self.settings.get("LISTING_READINESS") == "sleep":
+            await page.wait_for_timeout(5000)
+        else:
+            await page.locator(CARD_SELECTOR).first.wait_for()
+
+        clicks = iter(range(1, self.pages) if self.pages is not None else itertools.count())
+
+        # "Show more" has no URL, so a restarted crawl clicks back to where
+        # it stopped, leaving the harvesting until it gets there
+        replay = self.checkpoint.page if self.checkpoint is not None else 0
+        for _ in range(replay):
+            if next(clicks, None) is None:
+                break
+            try:
+                snapshot = await self.snapshot_listing(page, CARD_SELECTOR)
+                await page.get_by_test_id("show-more-button").click()
+                advanced = await self.wait_for_listing(page, CARD_SELECTOR, snapshot, 3000)
+            except playwright.async_api.TimeoutError:
+                logging.info("Listing ended before the checkpoint")
+                break
+            if not advanced:
+                await self.stall_listing(page)
+                return
+        if replay:
+            logging.info(f"Replayed {replay} listing clicks")
+
+        while True:
+            # Only the cards appended since the last batch are pulled, in one call
+            cards = await page.evaluate(HARVEST_JS, LINK_SELECTOR)
+            logging.info(f"Found {len(cards)} new article links")
+            new_links = 0
+            dates = []
+
+            for link, published, headline in cards:
+                if (
+                    not link
+                    or link in ("/news/", "/features/")
+                    or not link.startswith(("/news/", "/features/"))
+                    or "/liveblog/" in link
+                ):
+                    continue
+
+                link = response.urljoin(link)
+                logging.info(f"Operating on article: {link}")
+
+                published = card_date(link, published)
+                dates.append(published)
+                if self.skip_card(published):
+                    continue
+
+                if self.already_harvested(link):
+                    # Yielded before a restart
+                    new_links += 1
+                    continue
+
+                if self.is_known(link):
+                    logging.info("Skipping already stored article")
+                    continue
+                new_links += 1
+
+                yield scrapy.Request(
+                    link,
+                    self.parse_article,
+                    meta={"relevance_text": headline},
+                )
+                self.record_link(link)
+
+            self.checkpoint_page()
+
+            if self.listing_past_window(dates):
+                logging.info("Listing is past the date window, stopping")
+                break
+
+            # Cards are newest first, so once a whole batch was stored by a
+            # previous run everything below it was too
+            if cards and not new_links and not self.listing_ahead_of_window(dates):
+                logging.info("Reached already stored articles")
+                break
+
+            if not self.listing_page_done() or next(clicks, None) is None:
+                logging.info("Reached listing page limit")
+                break
+
+            # The page only ever grows and can't be reopened where it was
+            if await self.memory_pressure(page):
+                pruned = await page.evaluate(PRUNE_JS)
+                logging.info(f"Emptied {pruned} harvested cards")
+                self.crawler.stats.inc_value("memory/pruned_cards", pruned)
 
-        for i in range(1, self.pages) if self.pages is not None else itertools.count():
             try:
+                snapshot = await self.snapshot_listing(page, CARD_SELECTOR)
                 await page.get_by_test_id("show-more-button").click()
-                await page.wait_for_timeout(3000)
-                if await page.get_by_text("6 Oct 2023").count() > 0:
-                    logging.info("Found final article")
-                    break
+                advanced = await self.wait_for_listing(page, CARD_SELECTOR, snapshot, 3000)
             except playwright.async_api.TimeoutError:
                 logging.info("Reached final page")
                 break
+            if not advanced:
+                # Clicking on would only harvest nothing, forever
+                await self.stall_listing(page)
+                return
 
-        article_links = [
-            await e.get_attribute("href")
-            for e in await page.locator(
-                "//a[starts-with(@href,'/news/') or starts-with(@href,'/features/') and not(contains(@href,'/liveblog/))]"
-            ).all()
-        ]
-
-        logging.info(f"Found {len(article_links)} article links")
-
-        for link in article_links:
-            if link in ("/news/", "/features/"):
-                continue
-
-            logging.info(f"Operating on article: {link}")
-            yield scrapy.Request(
-                response.urljoin(link),
-                self.parse_article,
-            )
-
-        await page.close()
-
-    async def errback_close_page(self, failure):
-        page = failure.request.meta["playwright_page"]
-        await page.close()
-
-    def parse_article(self, response):
-        logging.info(f"Scraping article: {response.url}")
-        title = response.xpath("//main//h1/text()").get().strip()
-        content = " ".join(
-            "".join(e for e in p.xpath(".//text()").getall() if not e.isspace()).strip()
-            for p in response.xpath("//main[@id='main-content-area']//p")
-        )
-
-        logging.info(f"Found relevant article: {title}")
-
-        react_root = next(
-            r
-            for r in (
-                json.loads(x)
-                for x in response.xpath(
-                    "/html/head//script[@type='application/ld+json' and @data-reactroot='']/text()"
-                ).getall()
-            )
-            if r["@type"] == "NewsArticle"
-        )
-
-        author_data = react_root["author"]
-        if not isinstance(author_data, list):
-            author_data = [author_data]
-        authors = ",".join(x["name"] for x in author_data)
-
-        yield {
-            "title": title,
-            "content": content,
-            "publish_date": react_root["datePublished"],
-            "url": response.url,
-            "author": authors,
-            "word_count": len(content.split()),
-        }
+        await self.end_listing(page)
@@ -0,0 +1,368 @@
+import logging
+import time
+from datetime import date
+from urllib.parse import urlsplit
+
+import scrapy
+from scrapy import signals
+from scrapy_playwright.page import PageMethod
+
+from summerproject.checkpoint import ListingCheckpoint
+from summerproject.dates import card_date, parse_date
+from summerproject.executor import ExtractionExecutor
+from summerproject.memory import MemoryGovernor
+from summerproject.readiness import listing_snapshot, wait_for_listing_change
+from summerproject.seen import SeenIndex
+
+
+def rebase_url(url, base_url):
+    split = urlsplit(url)
+    path = split.path + (f"?{split.query}" if split.query else "")
+    return base_url.rstrip("/") + path
+
+
+class NewsSpider(scrapy.Spider):
+    """Shared plumbing for the Playwright-driven news site spiders."""
+
+    seen = None
+    extraction = None
+    checkpoint = None
+    governor = None
+    # Browser listings get a fresh context each time they are recycled
+    listing_contexts = 0
+    # Module-level function from summerproject.extractors for parse_article
+    extractor = None
+    # Only applies when no date window is given
+    max_articles = None
+    article_count = 0
+    # Only crawl articles published from since up to, not including, until,
+    # given as YYYY-MM-DD. Listings are newest first, so they stop paginating
+    # once their cards are older than since.
+    since = None
+    until = None
+    # Spiders whose search results are addressable by page number define
+    # listing_url(page_number), listing_selector and listing_cards(response),
+    # which returns the (link, date text) of every result
+    listing_url = None
+    listing_selector = None
+    # Crawl this scheme and host instead of the real site's, e.g. a clone
+    # served by "scrapy benchharness" (-a base_url=http://127.0.0.1:8000)
+    base_url = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.base_url:
+            self.start_urls = [rebase_url(url, self.base_url) for url in self.start_urls]
+        self.since = self._window_date("since", self.since)
+        self.until = self._window_date("until", self.until)
+        if self.since and self.until and self.since >= self.until:
+            raise ValueError(f"Empty date window: since {self.since}, until {self.until}")
+        # What a rejection depended on, by reason; RelevanceFilterMiddleware
+        # adds its vocabulary and threshold
+        self.rejection_scopes = {"outside_window": f"{self.since or ''}..{self.until or ''}"}
+
+    @staticmethod
+    def _window_date(name, value):
+        if value is None or isinstance(value, date):
+            return value
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a YYYY-MM-DD date, not {value!r}") from None
+
+    @property
+    def site_root(self):
+        split = urlsplit(self.start_urls[0])
+        return f"{split.scheme}://{split.netloc}"
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.seen = SeenIndex.from_settings(crawler.settings)
+        spider.checkpoint = ListingCheckpoint.from_crawler(crawler, spider)
+        crawler.signals.connect(spider.open_resources, signal=signals.spider_opened)
+        crawler.signals.connect(spider.close_resources, signal=signals.spider_closed)
+        return spider
+
+    def open_resources(self, spider):
+        # The crawler only creates its stats after the spider
+        self.extraction = ExtractionExecutor.from_crawler(self.crawler)
+        self.governor = MemoryGovernor.from_crawler(self.crawler)
+
+    def start_requests(self):
+        shards = self.listing_shards()
+        # A replay has no live browser page to click through the listing
+        offline = self.settings.getbool("HTTPCACHE_OFFLINE")
+        if offline and self.listing_url is None:
+            logging.warning(f"{self.name} has no listing pages to replay from the cache")
+            return
+        if shards > 1 or offline:
+            logging.info(f"Walking listing pages in {shards} shards")
+            for page_number in range(1, shards + 1):
+                yield self.listing_request(page_number)
+            return
+
+        if self.checkpoint is not None and self.checkpoint.resumed:
+            yield from self.resume_listing()
+            return
+
+        for url in self.start_urls:
+            logging.info(f"Starting request for URL: {url}")
+            yield self.browser_listing_request(url)
+
+    def browser_listing_request(self, url, page_number=1, **kwargs):
+        return scrapy.Request(
+            url,
+            meta={
+                "playwright": True,
+                "playwright_include_page": True,
+                "playwright_context": f"listing-{self.listing_contexts}",
+                "listing_page": page_number,
+            },
+            errback=self.errback_close_page,
+            **kwargs,
+        )
+
+    def resume_listing(self):
+        checkpoint = self.checkpoint
+        logging.info(
+            f"Resuming listing after page {checkpoint.page} with {len(checkpoint.links)}"
+            f" links harvested, the last {checkpoint.last_link}"
+        )
+        self.article_count = checkpoint.article_count
+        self.crawler.stats.set_value("listing/pages", checkpoint.page)
+
+        # Harvested links may not have been fetched before the restart. The
+        # dupefilter of a JOBDIR crawl drops the ones already requested.
+        for link in checkpoint.links:
+            if not self.is_known(link):
+                yield scrapy.Request(link, self.parse_article)
+
+        if checkpoint.complete:
+            return
+        # Spiders with addressable listing pages open the next one directly,
+        # the others click their way back in parse
+        if self.listing_url is not None:
+            page_number = checkpoint.page + 1
+            url = self.listing_url(page_number)
+        else:
+            page_number, url = 1, self.start_urls[0]
+        # JOBDIR's dupefilter has already seen the listing URL
+        yield self.browser_listing_request(url, page_number, dont_filter=True)
+
+    def listing_shards(self):
+        if self.listing_url is None:
+            return 1
+        return int(getattr(self, "shards", None) or self.settings.getint("LISTING_SHARDS"))
+
+    def listing_request(self, page_number):
+        # Shard i walks pages i, i + N, i + 2N, ... in its own browser context.
+        # Pages that already carry their results in the HTML skip the browser.
+        shards = self.listing_shards()
+        return scrapy.Request(
+            self.listing_url(page_number),
+            self.parse_listing_page,
+            meta={
+                "render": "auto",
+                "render_selector": self.listing_selector,
+                "render_backend": "playwright",
+                "playwright_context": f"shard-{(page_number - 1) % shards}",
+                "playwright_page_methods": [
+                    PageMethod("wait_for_selector", self.listing_selector),
+                ],
+                "listing_page": page_number,
+            },
+        )
+
+    def parse_listing_page(self, response):
+        page_number = response.meta["listing_page"]
+        cards = self.listing_cards(response)
+        logging.info(f"Found {len(cards)} links on listing page {page_number}")
+        new_links = 0
+        dates = []
+
+        for link, published in cards:
+            link = response.urljoin(link)
+            published = card_date(link, published)
+            dates.append(published)
+            if self.skip_card(published):
+                continue
+            if self.is_known(link):
+                logging.info("Skipping already stored article")
+                continue
+            new_links += 1
+
+            # Shards share the scheduler, so its dupefilter merges their links
+            yield scrapy.Request(
+                link,
+                self.parse_article,
+            )
+
+            self.article_count += 1
+            if self.reached_max_articles():
+                logging.info(f"Reached max articles limit: {self.max_articles}")
+                return
+
+        if self.listing_past_window(dates):
+            logging.info(f"Listing page {page_number} is past the date window, ending shard")
+            return
+
+        if not new_links and not self.listing_ahead_of_window(dates):
+            logging.info(f"Listing page {page_number} has nothing new, ending shard")
+            return
+
+        if self.listing_page_done():
+            yield self.listing_request(page_number + self.listing_shards())
+
+    @property
+    def windowed(self):
+        return self.since is not None or self.until is not None
+
+    def outside_window(self, published):
+        if published is None:
+            return False
+        return bool(
+            (self.since and published < self.since) or (self.until and published >= self.until)
+        )
+
+    def skip_card(self, published):
+        """Whether a listing card's article is outside the date window, so not
+        worth fetching. Cards without a date are kept."""
+        if self.outside_window(published):
+            self.crawler.stats.inc_value("window/skipped_links")
+            return True
+        return False
+
+    def listing_past_window(self, dates):
+        # The last dated card is the oldest one on the page
+        known = [d for d in dates if d is not None]
+        return bool(self.since and known and known[-1] < self.since)
+
+    def listing_ahead_of_window(self, dates):
+        # Pages newer than the window have nothing to fetch but must be paged through
+        known = [d for d in dates if d is not None]
+        return bool(self.until and known and known[-1] >= self.until)
+
+    def reached_max_articles(self):
+        # A date window bounds the crawl by itself
+        if self.windowed or not self.max_articles:
+            return False
+        return self.article_count >= int(self.max_articles)
+
+    def is_known(self, url):
+        # Articles stored by a previous run don't need to be fetched again, nor
+        # ones it rejected for reasons that still hold
+        if self.seen is None:
+            return False
+        return url in self.seen or self.seen.rejected(url, self.rejection_scopes)
+
+    def reject(self, url, reason):
+        """Record that ``url`` was rejected for ``reason``, whose scope must be
+        in rejection_scopes."""
+        if self.seen is not None:
+            self.seen.reject(url, self.name, reason, self.rejection_scopes[reason])
+
+    def already_harvested(self, url):
+        return self.checkpoint is not None and url in self.checkpoint
+
+    def record_link(self, url):
+        if self.checkpoint is not None:
+            self.checkpoint.add(url)
+
+    def checkpoint_page(self):
+        if self.checkpoint is not None:
+            self.checkpoint.page_done(self.article_count)
+
+    async def memory_pressure(self, page):
+        """Why the listing page should shed memory, or None."""
+        if self.governor is None:
+            return None
+        reason = await self.governor.check(page)
+        if reason:
+            logging.info(f"Listing page over its memory budget: {reason}")
+        return reason
+
+    async def recycle_listing(self, page, page_number):
+        """Close the listing page and its browser context, returning a request
+        that reopens the listing at ``page_number`` in a fresh context."""
+        context = page.context
+        await page.close()
+        await context.close()
+        self.crawler.stats.inc_value("memory/recycled_listings")
+
+        self.listing_contexts += 1
+        return self.browser_listing_request(
+            self.listing_url(page_number), page_number, dont_filter=True
+        )
+
+    async def stall_listing(self, page):
+        """Give up on a listing whose next page never loaded. The checkpoint
+        isn't finished, so the next run picks the listing up from there."""
+        logging.info("Listing did not advance, stopping")
+        self.crawler.stats.inc_value("listing/stalled")
+        await page.close()
+
+    async def end_listing(self, page):
+        if self.checkpoint is not None:
+            self.checkpoint.finish(self.article_count)
+        await page.close()
+
+    async def snapshot_listing(self, page, selector):
+        return await listing_snapshot(page, selector)
+
+    async def wait_for_listing(self, page, selector, snapshot, sleep_ms):
+        # "sleep" keeps the old fixed waits around for benchmarking
+        if self.settings.get("LISTING_READINESS") == "sleep":
+            await page.wait_for_timeout(sleep_ms)
+            return True
+        return await wait_for_listing_change(
+            page,
+            selector,
+            snapshot,
+            timeout=self.settings.getint("LISTING_READY_TIMEOUT"),
+            network_idle=self.settings.getbool("LISTING_READY_NETWORK_IDLE"),
+        )
+
+    def listing_page_done(self):
+        """Record a harvested listing page.
+
+        Returns False once LISTING_MAX_PAGES pages have been harvested.
+        """
+        stats = self.crawler.stats
+        now = time.time()
+        if not stats.get_value("listing/pages"):
+            stats.set_value("listing/first_page_time", now)
+        stats.inc_value("listing/pages")
+        stats.set_value("listing/last_page_time", now)
+
+        max_pages = self.settings.getint("LISTING_MAX_PAGES")
+        return not max_pages or stats.get_value("listing/pages") < max_pages
+
+    async def parse_article(self, response):
+        logging.info(f"Scraping article: {response.url}")
+        item = await self.extraction.extract(self.extractor, response)
+        # The listing couldn't tell this one's date
+        published = parse_date(item.get("publish_date"))
+        if self.outside_window(published):
+            logging.info(f"Dropping article published {published}, outside the date window")
+            self.crawler.stats.inc_value("window/dropped_articles")
+            self.reject(response.url, "outside_window")
+            return
+        logging.info(f"Found relevant article: {item['title']}")
+        yield item
+
+    def close_resources(self, spider, reason):
+        if self.seen is not None:
+            self.seen.close()
+        # An unfinished listing is picked up again by the next run
+        if self.checkpoint is not None and self.checkpoint.complete and reason == "finished":
+            self.checkpoint.clear()
+        # Not there if the spider failed before spider_opened
+        if self.extraction is not None:
+            self.extraction.close()
+
+    async def errback_close_page(self, failure):
+        # Not there if the request never reached the browser
+        page = failure.request.meta.get("playwright_page")
+        if page is not None:
+            await page.close()
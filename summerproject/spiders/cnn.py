@@ -1,106 +1,129 @@
 import scrapy
 import logging
-import re
 import playwright
 
+from summerproject.extractors import extract_cnn
+from summerproject.rendering import LIGHTWEIGHT_PROFILE
+from summerproject.dates import card_date
+from summerproject.spiders.base import NewsSpider
 
-class CnnSpider(scrapy.Spider):
+CARD_SELECTOR = "div[data-editable='cards'] div[data-component-name='card']"
+DATE_SELECTOR = ".container__date"
+
+# Returns [link, date text] for every result card
+CARDS_JS = """
+([card, published]) => [...document.querySelectorAll(card)].map(element => {
+    const date = element.querySelector(published);
+    return [element.dataset.openLink, date ? date.textContent.trim() : null];
+})
+"""
+
+
+class CnnSpider(NewsSpider):
     name = "cnn"
     start_urls = [
-        'https://www.cnn.com/search?q=israel+gaza+hamas+palestine+"west+bank"=&types=article',
+        'https://www.cnn.com/search?q=israel+gaza+hamas+palestine+"west+bank"=&types=article&sort=newest',
     ]
+    extractor = staticmethod(extract_cnn)
     custom_settings = {
         "PLAYWRIGHT_LAUNCH_OPTIONS": {
             "headless": True,
         },
         "DUPEFILTER_DEBUG": True,
+        "RENDER_PROFILE": LIGHTWEIGHT_PROFILE,
     }
     max_articles = 50
     article_count = 0
+    listing_selector = CARD_SELECTOR
+    page_size = 10
 
-    def start_requests(self):
-        for url in self.start_urls:
-            logging.info(f"Starting request for URL: {url}")
-            yield scrapy.Request(
-                url,
-                meta={
-                    "playwright": True,
-                    "playwright_include_page": True,
-                },
-                errback=self.errback_close_page,
-            )
+    def listing_url(self, page_number):
+        offset = (page_number - 1) * self.page_size
+        return f"{self.start_urls[0]}&from={offset}&page={page_number}&size={self.page_size}"
+
+    def listing_cards(self, response):
+        return [
+            (card.attrib.get("data-open-link"), card.css(f"{DATE_SELECTOR}::text").get())
+            for card in response.css(CARD_SELECTOR)
+        ]
 
     async def parse(self, response):
         page = response.meta["playwright_page"]
+        page_number = response.meta.get("listing_page", 1)
         cards_locator = page.locator("//div[@data-editable='cards']")
 
         while True:
             await cards_locator.wait_for()
+            cards = await page.evaluate(CARDS_JS, [CARD_SELECTOR, DATE_SELECTOR])
 
-            article_links = [
-                await e.get_attribute("data-open-link")
-                for e in await cards_locator.locator(
-                    "//div[@data-component-name='card']"
-                ).all()
-            ]
-
-            logging.info(f"Found {len(article_links)} article links")
+            logging.info(f"Found {len(cards)} article links")
+            new_links = 0
+            dates = []
 
-            for link in article_links:
+            for link, published in cards:
+                link = response.urljoin(link)
                 logging.info(f"Operating on article: {link}")
+
+                published = card_date(link, published)
+                dates.append(published)
+                if self.skip_card(published):
+                    continue
+
+                if self.already_harvested(link):
+                    # Yielded before a restart, or again after the results shifted
+                    new_links += 1
+                    continue
+
+                if self.is_known(link):
+                    logging.info("Skipping already stored article")
+                    continue
+                new_links += 1
+
                 yield scrapy.Request(
-                    response.urljoin(link),
+                    link,
                     self.parse_article,
                 )
+                self.record_link(link)
 
                 self.article_count += 1
 
-                if self.article_count >= self.max_articles:
+                if self.reached_max_articles():
                     logging.info(f"Reached max articles limit: {self.max_articles}")
-                    await page.close()
+                    await self.end_listing(page)
                     return
 
+            self.checkpoint_page()
+
+            if self.listing_past_window(dates):
+                logging.info("Listing is past the date window, stopping")
+                await self.end_listing(page)
+                return
+
+            if not new_links and not self.listing_ahead_of_window(dates):
+                logging.info("Listing page only has known articles, stopping")
+                await self.end_listing(page)
+                return
+
+            if not self.listing_page_done():
+                logging.info("Reached listing page limit")
+                await self.end_listing(page)
+                return
+
+            if await self.memory_pressure(page):
+                yield await self.recycle_listing(page, page_number + 1)
+                return
+
+            snapshot = await self.snapshot_listing(page, CARD_SELECTOR)
             try:
                 await page.locator("div.pagination-arrow-right.text-active").click()
             except playwright.async_api.TimeoutError:
                 logging.info("No more pages, closing")
-                await page.close()
+                await self.end_listing(page)
                 return
+            page_number += 1
 
             logging.info("Following next page")
-            # HACK: ensure that the next page has loaded in properly
-            await page.wait_for_timeout(5000)
-
-    async def errback_close_page(self, failure):
-        page = failure.request.meta["playwright_page"]
-        await page.close()
-
-    def parse_article(self, response):
-        logging.info(f"Scraping article: {response.url}")
-
-        title = response.css("h1#maincontent::text").get().strip()
-        content = " ".join(
-            "".join(p.xpath(".//text()").getall()).strip()
-            for p in response.xpath("//p[@data-component-name='paragraph']")
-        )
-
-        logging.info(f"Found relevant article: {title}")
-
-        # Locate the script block that sets window.CNN metadata
-        script_block = response.xpath(
-            "/html/head/script[contains(.,'window.CNN = ')]"
-        ).get()
-        published_date = re.search(" published_date: '(.*)',", script_block).group(1)
-        # TODO: A lot of articles seem to have an empty author field, may need to extract from page content
-        author = re.search(" author: '(.*)',", script_block).group(1)
-        affiliation = re.search(" section: '(.*)',", script_block).group(1)
-
-        yield {
-            "title": title,
-            "content": content,
-            "publish_date": published_date,
-            "url": response.url,
-            "author": author,
-            "word_count": len(content.split()),
-            "affiliation": affiliation,
-        }
+            if not await self.wait_for_listing(page, CARD_SELECTOR, snapshot, 5000):
+                # Harvesting the same cards again would never end
+                await self.stall_listing(page)
+                return
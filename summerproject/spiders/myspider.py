@@ -1,7 +1,8 @@
 import scrapy
-from scrapy_splash import SplashRequest
 import logging
 
+ARTICLE_LINK_SELECTOR = 'a[href*="/news/articles/"][data-testid="internal-link"]'
+
 class BbcSpider(scrapy.Spider):
     name = "bbc"
     start_urls = ["https://www.bbc.com/news/topics/c2vdnvdg6xxt"]
@@ -15,15 +16,30 @@ class BbcSpider(scrapy.Spider):
         'HTTPCACHE_STORAGE': 'scrapy_splash.SplashAwareFSCacheStorage',
         'SPLASH_TIMEOUT': 90,
         'SPLASH_WAIT': 2,
+        'RENDER_FALLBACK': 'splash',
+        'DOWNLOADER_MIDDLEWARES': {
+            'summerproject.middlewares.AdaptiveRenderMiddleware': 540,
+            'summerproject.middlewares.AdaptiveConcurrencyMiddleware': 545,
+            'scrapy_splash.SplashCookiesMiddleware': 723,
+            'scrapy_splash.SplashMiddleware': 725,
+            'scrapy.downloadermiddlewares.httpcompression.HttpCompressionMiddleware': 810,
+            'summerproject.middlewares.SummerprojectDownloaderMiddleware': 950,
+        },
+        'SPIDER_MIDDLEWARES': {
+            'scrapy_splash.SplashDeduplicateArgsMiddleware': 100,
+            'summerproject.middlewares.RelevanceFilterMiddleware': 543,
+            'summerproject.middlewares.SummerprojectSpiderMiddleware': 950,
+        },
     }
 
     def start_requests(self):
         for url in self.start_urls:
             logging.info(f"Starting request for URL: {url}")
-            yield SplashRequest(
+            # Only pay for a Splash render when the links aren't in the plain HTML
+            yield scrapy.Request(
                 url,
                 self.parse,
-                args={'wait': 2},
+                meta={'render': 'auto', 'render_selector': ARTICLE_LINK_SELECTOR},
             )
 
     def parse(self, response):
@@ -32,7 +48,7 @@ class BbcSpider(scrapy.Spider):
         logging.debug(f"Response headers: {response.headers}")
 
         # Adjust the CSS selector based on BBC News HTML structure
-        article_links = response.css('a[href*="/news/articles/"][data-testid="internal-link"]::attr(href)').getall()
+        article_links = response.css(f'{ARTICLE_LINK_SELECTOR}::attr(href)').getall()
         logging.info(f"Found {len(article_links)} article links")
 
         for link in article_links:
@@ -41,10 +57,10 @@ class BbcSpider(scrapy.Spider):
                 return
             full_url = response.urljoin(link)
             logging.info(f"Following link: {full_url}")
-            yield SplashRequest(
+            yield scrapy.Request(
                 full_url,
                 self.parse_article,
-                args={'wait': 2},
+                meta={'render': 'auto', 'render_selector': 'div[data-component="text-block"]'},
             )
 
     def parse_article(self, response):
@@ -52,16 +68,14 @@ class BbcSpider(scrapy.Spider):
             return
 
         logging.info(f"Scraping article: {response.url}")
-        if 'Gaza' in response.text:
-            title = response.css("h1::text").get()
-            # Extracting all text within the specified div
-            content = ' '.join(response.css('div[data-component="text-block"] p::text').getall())
-            logging.info(f"Found relevant article: {title}")
-            self.article_count += 1  # Increment the article counter
-            yield {
-                "title": title,
-                "url": response.url,
-                "content": content,
-            }
-        else:
-            logging.debug(f"Article does not contain 'Gaza': {response.url}")
+        # Off-topic pages are already dropped by RelevanceFilterMiddleware
+        title = response.css("h1::text").get()
+        # Extracting all text within the specified div
+        content = ' '.join(response.css('div[data-component="text-block"] p::text').getall())
+        logging.info(f"Found relevant article: {title}")
+        self.article_count += 1  # Increment the article counter
+        yield {
+            "title": title,
+            "url": response.url,
+            "content": content,
+        }
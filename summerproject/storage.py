@@ -0,0 +1,83 @@
+import json
+import sqlite3
+import time
+import zlib
+
+from summerproject.dates import parse_date
+
+
+def _iso_date(text):
+    published = parse_date(text)
+    return published.isoformat() if published else None
+
+
+class ArticleStore:
+    """SQLite article store with zlib-compressed bodies.
+
+    Only the columns needed to find articles are kept uncompressed; the full
+    item lives in the compressed ``data`` column. ``publish_date`` is stored
+    as an ISO date so date ranges and ordering work; the date as the site
+    printed it stays in ``data``. Not thread-safe: use it from
+    a single writer thread.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            " url TEXT PRIMARY KEY,"
+            " site TEXT NOT NULL,"
+            " publish_date TEXT,"
+            " title TEXT,"
+            " stored_at REAL,"
+            " data BLOB)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS articles_site_date"
+            " ON articles (site, publish_date, url)"
+        )
+        self.connection.commit()
+
+    def insert_many(self, site_items):
+        """Store a batch of (site, item dict) pairs in one transaction."""
+        now = time.time()
+        rows = [
+            (
+                item["url"],
+                site,
+                _iso_date(item.get("publish_date")),
+                item.get("title"),
+                now,
+                zlib.compress(json.dumps(item).encode("utf-8")),
+            )
+            for site, item in site_items
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO articles"
+                " (url, site, publish_date, title, stored_at, data)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def articles(self, site, since=None, until=None):
+        """Yield stored items for a site, optionally within a publish date range
+        given as ISO dates."""
+        query = "SELECT data FROM articles WHERE site = ?"
+        params = [site]
+        if since is not None:
+            query += " AND publish_date >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND publish_date < ?"
+            params.append(until)
+        query += " ORDER BY publish_date, url"
+
+        for (data,) in self.connection.execute(query, params):
+            yield json.loads(zlib.decompress(data))
+
+    def close(self):
+        self.connection.close()
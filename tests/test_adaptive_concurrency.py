@@ -0,0 +1,90 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from summerproject.middlewares import AdaptiveConcurrencyMiddleware
+
+SETTINGS = {
+    "ADAPTIVE_CONCURRENCY_ENABLED": True,
+    "ADAPTIVE_CONCURRENCY_START": {"plain": 4, "browser": 2},
+    "ADAPTIVE_CONCURRENCY_LIMITS": {"plain": [2, 6], "browser": [1, 8]},
+    "ADAPTIVE_CONCURRENCY_INTERVAL": 5.0,
+    "ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE": 2.0,
+    "ADAPTIVE_CONCURRENCY_ERROR_RATE": 0.05,
+    "ADAPTIVE_CONCURRENCY_BACKOFF": 0.5,
+    "ADAPTIVE_CONCURRENCY_BROWSER_MEMORY_MB": 4096,
+}
+SLOT = "example.com#plain"
+
+
+class FakeDownloader:
+    def __init__(self):
+        self.per_slot_settings = {}
+        self.slots = {}
+
+
+@pytest.fixture
+def mw():
+    crawler = get_crawler(settings_dict=SETTINGS)
+    crawler.engine = SimpleNamespace(downloader=FakeDownloader())
+    mw = AdaptiveConcurrencyMiddleware(crawler)
+    mw.process_request(Request("https://example.com/"), None)
+    downloader = crawler.engine.downloader
+    downloader.slots[SLOT] = SimpleNamespace(
+        concurrency=downloader.per_slot_settings[SLOT]["concurrency"], transferring=set()
+    )
+    return mw
+
+
+def interval(mw, latency, statuses=(200,) * 10, saturated=True):
+    """Feed one adjustment interval of downloads into the middleware and
+    return the slot's concurrency after it."""
+    slot = mw._downloader.slots[SLOT]
+    for status in statuses:
+        slot.transferring = set(range(slot.concurrency if saturated else 0))
+        request = Request(
+            "https://example.com/article",
+            meta={"download_slot": SLOT, "download_started": time.time() - latency},
+        )
+        mw.response_downloaded(Response(request.url, status=status), request, None)
+    mw.adjust()
+    assert mw._downloader.per_slot_settings[SLOT]["concurrency"] == slot.concurrency
+    return slot.concurrency
+
+
+def test_busy_slot_grows_by_one_up_to_its_limit(mw):
+    assert [interval(mw, 0.1) for _ in range(4)] == [5, 6, 6, 6]
+
+
+def test_idle_capacity_does_not_grow(mw):
+    assert interval(mw, 0.1, saturated=False) == 4
+
+
+def test_rate_limiting_backs_off_down_to_its_limit(mw):
+    throttled = (429,) + (200,) * 9
+    assert [interval(mw, 0.1, throttled) for _ in range(3)] == [2, 2, 2]
+
+
+def test_server_errors_back_off(mw):
+    assert interval(mw, 0.1, (503, 200, 200, 200)) == 2
+
+
+def test_errors_below_the_rate_are_tolerated(mw):
+    assert interval(mw, 0.1, (500,) + (200,) * 29) == 5
+
+
+def test_latency_rise_backs_off_then_recovers(mw):
+    assert interval(mw, 0.1) == 5
+    assert interval(mw, 0.15) == 6
+    # Over twice the best median seen
+    assert interval(mw, 0.3) == 3
+    assert interval(mw, 0.1) == 4
+
+
+def test_slot_without_downloads_is_left_alone(mw):
+    mw.adjust()
+    assert mw._downloader.slots[SLOT].concurrency == 4
@@ -0,0 +1,43 @@
+from datetime import date, datetime
+
+import pytest
+
+from summerproject.dates import card_date, parse_date
+
+NOW = datetime(2024, 5, 10, 3, 0)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("2024-05-01", date(2024, 5, 1)),
+        ("2024-05-01T22:15:00Z", date(2024, 5, 1)),
+        ("1 May 2024", date(2024, 5, 1)),
+        ("May 1, 2024", date(2024, 5, 1)),
+        ("September 30, 2024", date(2024, 9, 30)),
+        ("Wed May 1, 2024", date(2024, 5, 1)),
+        ("  May 1, 2024 ", date(2024, 5, 1)),
+        ("5 mins ago", date(2024, 5, 10)),
+        ("an hour ago", date(2024, 5, 10)),
+        ("3 hours ago", date(2024, 5, 10)),
+        # Past midnight, so yesterday
+        ("20 hours ago", date(2024, 5, 9)),
+        ("a day ago", date(2024, 5, 9)),
+        ("2 days ago", date(2024, 5, 8)),
+        ("1 week ago", date(2024, 5, 3)),
+        ("Yesterday", date(2024, 5, 9)),
+        ("3 months ago", None),
+        ("Updated recently", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_parse_date(text, expected):
+    assert parse_date(text, NOW) == expected
+
+
+def test_card_date_falls_back_to_the_url():
+    assert card_date("https://example.com/2024/09/30/story", None) == date(2024, 9, 30)
+    assert card_date("https://example.com/2024/09/30/story", "May 1, 2024") == date(2024, 5, 1)
+    assert card_date("https://example.com/2024/13/40/story", None) is None
+    assert card_date("https://example.com/story", "no date") is None
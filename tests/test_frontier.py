@@ -0,0 +1,153 @@
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.utils.test import get_crawler
+
+from summerproject import frontier
+from summerproject.frontier import Frontier, FrontierScheduler
+
+fakeredis = pytest.importorskip("fakeredis")
+# fakeredis runs the Lua scripts with lupa
+pytest.importorskip("lupa")
+
+LEASE_SECONDS = 60
+SETTINGS = {
+    "FRONTIER_URL": "redis://frontier",
+    "FRONTIER_KEY_PREFIX": "test",
+    "FRONTIER_LEASE_SECONDS": LEASE_SECONDS,
+    "FRONTIER_MAX_LEASES": 2,
+    "FRONTIER_PREFETCH": 32,
+    "FRONTIER_PERSIST": False,
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(frontier, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(frontier, "connect", lambda url: fakeredis.FakeRedis(server=server))
+    return server
+
+
+@pytest.fixture
+def queue(server):
+    return Frontier(fakeredis.FakeRedis(server=server), "test:spider", LEASE_SECONDS, 2)
+
+
+def test_expired_lease_is_requeued(queue, clock):
+    request_id = queue.push(b"first", 0)
+    assert queue.pop() == (str(request_id).encode(), b"first")
+    assert queue.pop() is None
+
+    clock.advance(LEASE_SECONDS + 1)
+    assert queue.pop() == (str(request_id).encode(), b"first")
+
+
+def test_renewed_lease_is_kept(queue, clock):
+    queue.push(b"first", 0)
+    request_id, _ = queue.pop()
+
+    clock.advance(LEASE_SECONDS / 2)
+    queue.renew([request_id])
+    clock.advance(LEASE_SECONDS / 2 + 1)
+    assert queue.pop() is None
+    assert queue.pending() == 1
+
+
+def test_acked_request_is_not_requeued(queue, clock):
+    queue.push(b"first", 0)
+    request_id, _ = queue.pop()
+    queue.ack(request_id)
+
+    clock.advance(LEASE_SECONDS + 1)
+    assert queue.pop() is None
+    assert queue.pending() == 0
+
+
+def test_request_is_dropped_after_max_leases(queue, clock):
+    queue.push(b"poison", 0)
+    for _ in range(2):
+        assert queue.pop()[1] == b"poison"
+        clock.advance(LEASE_SECONDS + 1)
+    assert queue.pop() is None
+    assert queue.pending() == 0
+
+
+def test_higher_priority_first_then_fifo(queue, clock):
+    queue.push(b"low", 0)
+    queue.push(b"high", 10)
+    queue.push(b"low again", 0)
+    assert [queue.pop()[1] for _ in range(3)] == [b"high", b"low", b"low again"]
+
+
+def scheduler(server):
+    crawler = get_crawler(Spider, SETTINGS)
+    crawler.engine = SimpleNamespace(slot=SimpleNamespace(inprogress=set()))
+    scheduler = FrontierScheduler.from_crawler(crawler)
+    scheduler.open(Spider("spider"))
+    return scheduler
+
+
+@pytest.fixture
+def workers(server, clock):
+    workers = [scheduler(server), scheduler(server)]
+    yield workers
+    for worker in workers:
+        worker.close("shutdown")
+
+
+def test_workers_share_one_seen_set(workers):
+    first, second = workers
+    assert first.enqueue_request(Request("https://example.com/a"))
+    assert not second.enqueue_request(Request("https://example.com/a"))
+    assert second.enqueue_request(Request("https://example.com/a", dont_filter=True))
+    assert second.stats.get_value("dupefilter/filtered") == 1
+
+    urls = [first.next_request().url, second.next_request().url]
+    assert urls == ["https://example.com/a", "https://example.com/a"]
+    assert first.next_request() is None
+
+
+def test_crashed_worker_requests_go_to_another(workers, clock):
+    first, second = workers
+    first.enqueue_request(Request("https://example.com/a"))
+    request = first.next_request()
+    # Downloading when the worker dies, so never acked or renewed
+    first.crawler.engine.slot.inprogress.add(request)
+    assert second.next_request() is None
+
+    clock.advance(LEASE_SECONDS + 1)
+    assert second.next_request().url == "https://example.com/a"
+
+
+def test_finished_requests_are_acked(workers, clock):
+    first, second = workers
+    first.enqueue_request(Request("https://example.com/a"))
+    request = first.next_request()
+    in_progress = first.crawler.engine.slot.inprogress
+    in_progress.add(request)
+    assert first.has_pending_requests()
+
+    # Out of the engine, so done with
+    in_progress.discard(request)
+    assert not first.has_pending_requests()
+    clock.advance(LEASE_SECONDS + 1)
+    assert second.next_request() is None
@@ -0,0 +1,45 @@
+import asyncio
+
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+
+from summerproject import memory
+from summerproject.memory import MemoryGovernor
+
+MB = 1024**2
+
+
+def governor(monkeypatch, rss_values):
+    settings = {
+        "MEMORY_GOVERNOR_ENABLED": True,
+        "MEMORY_PAGE_HEAP_MB": 512,
+        "MEMORY_PAGE_NODES": 200_000,
+        "MEMORY_BROWSER_RSS_MB": 100,
+        "MEMORY_BROWSER_RSS_COOLDOWN": 2,
+    }
+    crawler = get_crawler(Spider, settings)
+    governor = MemoryGovernor.from_crawler(crawler)
+    rss = iter(rss_values)
+    monkeypatch.setattr(memory, "browser_rss", lambda: next(rss) * MB)
+
+    async def page_metrics(page):
+        return {"JSHeapUsedSize": 1 * MB, "Nodes": 100}
+
+    monkeypatch.setattr(governor, "page_metrics", page_metrics)
+    return governor
+
+
+def checks(governor, count):
+    return [bool(asyncio.run(governor.check(None))) for _ in range(count)]
+
+
+def test_browser_rss_is_ignored_after_reporting_it(monkeypatch):
+    # Other spiders' browsers keep it over budget whatever this one sheds
+    over = governor(monkeypatch, [200] * 10)
+    assert checks(over, 10) == [True, False, False, True] + [False] * 4 + [True, False]
+    assert over.stats.get_value("memory/browser_rss_ignored") == 7
+
+
+def test_cooldown_resets_once_browser_rss_is_back_under_budget(monkeypatch):
+    recovering = governor(monkeypatch, [200, 50, 200, 200, 200, 200])
+    assert checks(recovering, 6) == [True, False, True, False, False, True]
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from summerproject.partialjson import extract_paths
+
+STORY = "page.content.story.story"
+PATHS = [f"{STORY}.publishedDate", f"{STORY}.authorsStr", f"{STORY}.wordCount"]
+WRONG = {"story": {"story": {"publishedDate": "WRONG", "authorsStr": "WRONG", "wordCount": -1}}}
+STORY_VALUES = {"story": {"publishedDate": "2024-05-01", "authorsStr": "A, B", "wordCount": 812}}
+
+DOCUMENTS = [
+    {"page": {"content": {"story": STORY_VALUES}}},
+    # The same keys nested ahead of the real ones
+    {"page": {"meta": {"content": {}}, "related": [WRONG], "content": {"story": STORY_VALUES}}},
+    {"page": {"content": {"modules": [WRONG, {"x": WRONG}], "story": STORY_VALUES}}},
+    # ... and in an object that closes before the real one opens
+    {"head": {"page": {"content": WRONG}}, "page": {"content": {"story": STORY_VALUES}}},
+    {"page": {"content": {"related": WRONG}, "other": WRONG}},
+    # Keys and brackets inside strings
+    {
+        "page": {
+            "title": 'a "story": {"story": [ not json',
+            "escaped": 'back\\slash \\" } ] "',
+            "content": {"story": STORY_VALUES},
+        }
+    },
+    # Missing values
+    {"page": {"content": {"story": {"story": {"publishedDate": "2024-05-01"}}}}},
+    {"page": {"content": {"story": None}}},
+    {"page": []},
+]
+
+
+def lookup(document, path):
+    value = document
+    for key in path.split("."):
+        value = value[int(key)] if isinstance(value, list) else value[key]
+    return value
+
+
+def expected(document, paths):
+    values = {}
+    for path in paths:
+        try:
+            values[path] = lookup(document, path)
+        except (KeyError, IndexError, TypeError, ValueError):
+            pass
+    return values
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("indent", [None, 2])
+def test_matches_a_full_decode(document, indent):
+    text = json.dumps(document, indent=indent)
+    assert extract_paths(text, PATHS) == expected(json.loads(text), PATHS)
+
+
+def test_skips_a_prefix_and_trailing_script():
+    document = DOCUMENTS[1]
+    text = f"window['state']={json.dumps(document)};window.other={{}};"
+    start = len("window['state']=")
+    assert extract_paths(text, PATHS, start) == expected(document, PATHS)
+
+
+def test_array_elements():
+    document = {"@type": "NewsArticle", "author": [{"name": "A"}, {"name": "B", "author": WRONG}]}
+    paths = ["@type", "author.1.name", "author.0.name", "author.2.name", "datePublished"]
+    assert extract_paths(json.dumps(document), paths) == expected(document, paths)
@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+from scrapy.utils.test import get_crawler
+
+from summerproject.spiders.base import NewsSpider
+
+
+class WindowSpider(NewsSpider):
+    name = "window"
+    start_urls = ["https://example.com/news"]
+
+
+def spider(tmp_path=None, **kwargs):
+    settings = {"LISTING_CHECKPOINT_DIR": str(tmp_path) if tmp_path else ""}
+    crawler = get_crawler(WindowSpider, settings)
+    return WindowSpider.from_crawler(crawler, **kwargs)
+
+
+@pytest.fixture
+def windowed():
+    return spider(since="2024-05-01", until="2024-06-01")
+
+
+def test_window_arguments_are_dates(windowed):
+    assert (windowed.since, windowed.until) == (date(2024, 5, 1), date(2024, 6, 1))
+    with pytest.raises(ValueError):
+        spider(since="May 2024")
+    with pytest.raises(ValueError):
+        spider(since="2024-06-01", until="2024-05-01")
+
+
+@pytest.mark.parametrize(
+    "published, skipped",
+    [
+        (date(2024, 4, 30), True),
+        (date(2024, 5, 1), False),
+        (date(2024, 5, 31), False),
+        # until is exclusive
+        (date(2024, 6, 1), True),
+        (None, False),
+    ],
+)
+def test_skip_card(windowed, published, skipped):
+    assert windowed.skip_card(published) is skipped
+    assert windowed.crawler.stats.get_value("window/skipped_links", 0) == int(skipped)
+
+
+def test_open_ended_windows():
+    since = spider(since="2024-05-01")
+    assert since.skip_card(date(2024, 4, 30))
+    assert not since.skip_card(date(2030, 1, 1))
+    until = spider(until="2024-05-01")
+    assert until.skip_card(date(2024, 5, 1))
+    assert not until.skip_card(date(2000, 1, 1))
+    assert not spider().skip_card(date(2000, 1, 1))
+
+
+@pytest.mark.parametrize(
+    "dates, past, ahead",
+    [
+        # Newest first, so the last dated card decides
+        ([date(2024, 6, 5), date(2024, 6, 2)], False, True),
+        ([date(2024, 6, 5), date(2024, 5, 20)], False, False),
+        ([date(2024, 5, 3), date(2024, 4, 28)], True, False),
+        ([date(2024, 5, 3), date(2024, 4, 28), None], True, False),
+        ([None, None], False, False),
+        ([], False, False),
+    ],
+)
+def test_listing_position(windowed, dates, past, ahead):
+    assert windowed.listing_past_window(dates) is past
+    assert windowed.listing_ahead_of_window(dates) is ahead
+
+
+def test_unwindowed_listing_never_past_or_ahead():
+    dates = [date(2000, 1, 2), date(2000, 1, 1)]
+    assert not spider().listing_past_window(dates)
+    assert not spider().listing_ahead_of_window(dates)
+
+
+def test_checkpoints_are_kept_per_window(tmp_path):
+    first = spider(tmp_path, since="2024-05-01", until="2024-06-01").checkpoint
+    first.add("https://example.com/a")
+    first.page_done(1)
+
+    assert spider(tmp_path, since="2024-05-01", until="2024-06-01").checkpoint.resumed
+    assert not spider(tmp_path, since="2024-04-01", until="2024-05-01").checkpoint.resumed
+    assert not spider(tmp_path).checkpoint.resumed